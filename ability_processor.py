@@ -0,0 +1,279 @@
+import argparse
+import json
+import logging
+import re
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Keyword abilities from rule 702 that show up as a bare keyword line, optionally with a parameter
+KEYWORD_ABILITIES = [
+    "deathtouch", "defender", "double strike", "enchant", "equip", "first strike", "flash", "flying",
+    "haste", "hexproof", "indestructible", "intimidate", "landwalk", "lifelink", "protection", "reach",
+    "shroud", "trample", "vigilance", "ward", "banding", "rampage", "cumulative upkeep", "flanking",
+    "phasing", "buyback", "shadow", "cycling", "echo", "horsemanship", "fading", "kicker", "flashback",
+    "madness", "fear", "morph", "amplify", "provoke", "storm", "affinity", "entwine", "modular",
+    "sunburst", "bushido", "soulshift", "splice", "offering", "ninjutsu", "epic", "convoke", "dredge",
+    "transmute", "bloodthirst", "haunt", "replicate", "forecast", "graft", "recover", "ripple",
+    "split second", "suspend", "vanishing", "absorb", "aura swap", "delve", "fortify", "frenzy",
+    "gravestorm", "poisonous", "transfigure", "champion", "changeling", "evoke", "hideaway",
+    "prowl", "reinforce", "conspire", "persist", "wither", "retrace", "devour", "exalted", "unearth",
+    "cascade", "annihilator", "level up", "rebound", "totem armor", "infect", "battle cry",
+    "living weapon", "undying", "miracle", "soulbond", "overload", "scavenge", "unleash", "cipher",
+    "evolve", "extort", "fuse", "bestow", "tribute", "dethrone", "hidden agenda", "outlast",
+    "prowess", "dash", "exploit", "menace", "renown", "awaken", "devoid", "ingest", "myriad",
+    "surge", "skulk", "emerge", "escalate", "melee", "crew", "fabricate", "partner", "undaunted",
+    "improvise", "aftermath", "embalm", "eternalize", "afflict", "ascend", "assist", "jump-start",
+    "mentor", "afterlife", "riot", "spectacle", "escape", "companion", "mutate", "encore", "boast",
+    "foretell", "demonstrate", "daybound", "nightbound", "disturb", "decayed", "cleave", "training",
+    "compleated", "reconfigure", "blitz", "casualty", "enlist", "read ahead", "ravenous", "squad",
+    "space sculptor", "visit", "prototype", "living metal", "more than meets the eye", "for mirrodin!",
+    "toxic", "backup", "bargain", "craft", "disguise", "solved", "plot", "saddle", "spree", "offspring",
+    "impending", "gift", "exhaust", "max speed", "start your engines!", "harmonize", "mobilize",
+]
+
+REMINDER_TEXT_PATTERN = re.compile(r'\s*\([^)]*\)')
+# "Landfall — Whenever ...": an ability word has no rules meaning of its own
+ABILITY_WORD_PATTERN = re.compile(r"^([A-Z][\w' ,-]*?) — (.+)$")
+CHAPTER_PATTERN = re.compile(r'^((?:[IVX]+)(?:, [IVX]+)*) — (.+)$')
+LOYALTY_PATTERN = re.compile(r'^([+−-]?(?:\d+|X)): (.+)$')
+TRIGGER_PATTERN = re.compile(r'^(When|Whenever|At)\b', re.IGNORECASE)
+# A cost is a comma-separated list of mana symbols and cost actions; anything else before a colon isn't a cost
+COST_PART_PATTERN = re.compile(
+    r'^(?:(?:\{[^}]+\})+|(?:Sacrifice|Discard|Pay|Tap|Untap|Exile|Remove|Return|Put|Reveal|Mill|Collect|Forage)\b.*)$'
+)
+# "Flying creatures you control get +1/+1" starts with a keyword but is a static ability
+NOT_A_KEYWORD_PARAMETER = re.compile(r"\b(?:get|gets|have|has|can|can't|you|your|is|are|deals?)\b", re.IGNORECASE)
+# Keywords whose parameter can itself contain a comma, e.g. a card name in "Partner with Brallin, Skyshark Rider"
+COMMA_PARAMETER_KEYWORDS = frozenset({"partner", "companion", "casualty"})
+TARGET_PATTERN = re.compile(
+    r"\b(any (?:other )?target|"
+    r"(?:(?:up to (?:one|two|three|four|five|X|\d+)|any number of) )?(?:(?:another|other) )?target "
+    r"(?:[\w'-]+ ){0,4}?(?:creature|player|opponent|permanent|spell|ability|artifact|enchantment|land|"
+    r"planeswalker|battle|card|token|creatures|players|permanents|spells|cards)(?: or (?:[\w'-]+ ){0,2}?"
+    r"(?:creature|player|planeswalker|permanent|battle|spell|ability))?|"
+    # "up to two targets", "one, two, or three targets": divided damage without a noun
+    r"(?:up to (?:one|two|three|four|five|X|\d+)|(?:one, )?two,? or three|any number of) targets)",
+    re.IGNORECASE
+)
+SPELL_TYPES = ("Instant", "Sorcery")
+
+def strip_reminder_text(text: str) -> str:
+    return REMINDER_TEXT_PATTERN.sub('', text).strip()
+
+def is_cost(text: str) -> bool:
+    return all(COST_PART_PATTERN.match(part.strip()) for part in text.split(','))
+
+def find_targets(text: str) -> List[str]:
+    return [match.lower() for match in TARGET_PATTERN.findall(text)]
+
+def index_keywords(keywords) -> Dict[str, List[str]]:
+    """Group keywords by their first word, longest first, so "flashback" is tried before "flash"."""
+    index = {}
+    for keyword in sorted(set(keywords), key=len, reverse=True):
+        index.setdefault(re.split(r'[ —]', keyword)[0], []).append(keyword)
+    return index
+
+KEYWORD_INDEX = index_keywords(KEYWORD_ABILITIES)
+KNOWN_KEYWORDS = frozenset(KEYWORD_ABILITIES)
+
+def match_keyword(part: str, keywords: Dict[str, List[str]]) -> Optional[Dict[str, str]]:
+    """Return the keyword and its parameter if part is a keyword ability such as "Ward {2}" or "Protection from red"."""
+    lowered = part.lower()
+    for keyword in keywords.get(re.split(r'[ —]', lowered)[0], []):
+        if lowered == keyword or lowered.startswith(keyword + " ") or lowered.startswith(keyword + "—"):
+            parameter = part[len(keyword):].lstrip(" —").rstrip('.')
+            if parameter and not part[len(keyword):].lstrip().startswith("—") and NOT_A_KEYWORD_PARAMETER.search(parameter):
+                return None
+            return {"keyword": keyword, "keyword_parameter": parameter or None}
+    return None
+
+def split_keyword_line(line: str, keywords: Dict[str, List[str]]) -> Optional[List[Dict[str, str]]]:
+    """Split "Flying, vigilance" into keyword abilities; None if any part isn't a keyword."""
+    # Keywords whose parameter contains commas ("Ward—Pay 3 life, ...") can't be split on commas
+    whole = match_keyword(line, keywords)
+    if whole and '—' in line:
+        return [whole]
+    matches = []
+    for part in (part.strip() for part in line.split(',')):
+        if not part:
+            continue
+        match = match_keyword(part, keywords)
+        if match is None and matches and matches[-1]["keyword"] in COMMA_PARAMETER_KEYWORDS and matches[-1]["keyword_parameter"]:
+            # Not a keyword of its own: the rest of the previous keyword's parameter
+            matches[-1]["keyword_parameter"] += ", " + part
+            continue
+        if match is None:
+            return None
+        matches.append(match)
+    return matches or None
+
+def parse_ability(line: str, keywords: Dict[str, List[str]], is_spell: bool) -> List[Dict[str, Any]]:
+    text = strip_reminder_text(line)
+    if not text:
+        # Reminder text only, e.g. a basic land's mana ability
+        text = line.strip('() ')
+    ability = {
+        "kind": None, "text": line, "ability_word": None, "keyword": None, "keyword_parameter": None,
+        "trigger_condition": None, "cost": None, "effect": None, "targets": [],
+    }
+
+    keyword_matches = split_keyword_line(text.rstrip('.'), keywords)
+    if keyword_matches:
+        return [{**ability, "kind": "keyword", **match} for match in keyword_matches]
+
+    chapter = CHAPTER_PATTERN.match(text)
+    if chapter:
+        ability.update(kind="chapter", trigger_condition=f"chapter {chapter.group(1)}", effect=chapter.group(2))
+    else:
+        ability_word = ABILITY_WORD_PATTERN.match(text)
+        if ability_word and not ability_word.group(1).lower().startswith(("choose", "when", "whenever", "at ")):
+            ability["ability_word"] = ability_word.group(1)
+            text = ability_word.group(2)
+
+        loyalty = LOYALTY_PATTERN.match(text)
+        colon = text.find(':')
+        quote = text.find('"')
+        if loyalty:
+            ability.update(kind="loyalty", cost=loyalty.group(1), effect=loyalty.group(2))
+        elif TRIGGER_PATTERN.match(text):
+            condition, _, effect = text.partition(', ')
+            ability.update(kind="triggered", trigger_condition=condition, effect=effect or None)
+        elif colon > 0 and (quote == -1 or colon < quote) and is_cost(text[:colon]):
+            ability.update(kind="activated", cost=text[:colon], effect=text[colon + 1:].strip())
+        else:
+            ability.update(kind="spell" if is_spell else "static", effect=text)
+
+    ability["targets"] = find_targets(ability["effect"] or "")
+    return [ability]
+
+def parse_oracle_text(oracle_text: Optional[str], type_line: Optional[str] = None,
+                      keywords: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Split a card's oracle text into structured abilities.
+
+    Each ability has a kind (keyword, triggered, activated, loyalty, chapter,
+    spell or static) plus whichever of ability_word, keyword, keyword_parameter,
+    trigger_condition, cost, effect and targets apply. Modal bullet points are
+    folded into the ability that introduces them.
+    """
+    if not oracle_text:
+        return []
+    card_keywords = {keyword.lower() for keyword in keywords or []}
+    known_keywords = KEYWORD_INDEX if card_keywords <= KNOWN_KEYWORDS else index_keywords(card_keywords | KNOWN_KEYWORDS)
+    is_spell = bool(type_line) and any(spell_type in type_line for spell_type in SPELL_TYPES)
+
+    lines = []
+    for line in oracle_text.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('•') and lines:
+            lines[-1] += '\n' + line
+        else:
+            lines.append(line)
+
+    abilities = []
+    for line in lines:
+        abilities.extend(parse_ability(line, known_keywords, is_spell))
+    for index, ability in enumerate(abilities):
+        ability["ability_index"] = index
+    return abilities
+
+def looks_unparsed(ability: Dict[str, Any]) -> bool:
+    """Static or spell text that still reads like a trigger or an activation, i.e. a likely parser miss."""
+    if ability["kind"] not in ("static", "spell"):
+        return False
+    text = ability["effect"] or ""
+    return bool(TRIGGER_PATTERN.match(text)) or (':' in text.split('"')[0] and '•' not in text)
+
+def setup_ability_table(conn: sqlite3.Connection):
+    c = conn.cursor()
+    c.execute('''CREATE TABLE IF NOT EXISTS card_abilities
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                 oracle_id TEXT, ability_index INTEGER, kind TEXT, text TEXT,
+                 ability_word TEXT, keyword TEXT, keyword_parameter TEXT,
+                 trigger_condition TEXT, cost TEXT, effect TEXT, targets TEXT,
+                 FOREIGN KEY (oracle_id) REFERENCES cards(oracle_id))''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_card_abilities_oracle_id ON card_abilities (oracle_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_card_abilities_kind ON card_abilities (kind)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_card_abilities_keyword ON card_abilities (keyword)")
+    conn.commit()
+
+def process_abilities(database_path: str, batch_size: int = 5000) -> Dict[str, Any]:
+    """
+    Parse the oracle text of every card in the cards table into card_abilities.
+
+    Existing abilities are replaced. Returns coverage and throughput figures:
+    abilities per kind, lines that still look like unparsed triggers or
+    activations, and how many of Scryfall's keyword-ability lines were recognised.
+    """
+    conn = sqlite3.connect(database_path)
+    try:
+        setup_ability_table(conn)
+        conn.execute("DELETE FROM card_abilities")
+        cards = conn.execute("SELECT oracle_id, oracle_text, type_line, keywords FROM cards").fetchall()
+
+        stats = {"cards": len(cards), "cards_with_text": 0, "abilities": 0, "by_kind": {},
+                 "unparsed": 0, "scryfall_keyword_lines": 0, "keyword_lines_recognised": 0}
+        rows = []
+        parse_seconds = 0.0
+        for oracle_id, oracle_text, type_line, keywords in cards:
+            keywords = json.loads(keywords) if keywords else []
+            start = time.perf_counter()
+            abilities = parse_oracle_text(oracle_text, type_line, keywords)
+            parse_seconds += time.perf_counter() - start
+            if oracle_text:
+                stats["cards_with_text"] += 1
+
+            parsed_keywords = {ability["keyword"] for ability in abilities if ability["keyword"]}
+            for keyword in keywords:
+                # Only keywords that open a line are abilities; the rest are actions ("scry") or ability words
+                if oracle_text and any(line.lower().startswith(keyword.lower()) for line in oracle_text.split('\n')):
+                    stats["scryfall_keyword_lines"] += 1
+                    stats["keyword_lines_recognised"] += keyword.lower() in parsed_keywords
+
+            for ability in abilities:
+                stats["by_kind"][ability["kind"]] = stats["by_kind"].get(ability["kind"], 0) + 1
+                stats["unparsed"] += looks_unparsed(ability)
+                rows.append((oracle_id, ability["ability_index"], ability["kind"], ability["text"],
+                             ability["ability_word"], ability["keyword"], ability["keyword_parameter"],
+                             ability["trigger_condition"], ability["cost"], ability["effect"],
+                             json.dumps(ability["targets"])))
+            if len(rows) >= batch_size:
+                conn.executemany("INSERT INTO card_abilities (oracle_id, ability_index, kind, text, ability_word, keyword, "
+                                 "keyword_parameter, trigger_condition, cost, effect, targets) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                stats["abilities"] += len(rows)
+                rows = []
+        if rows:
+            conn.executemany("INSERT INTO card_abilities (oracle_id, ability_index, kind, text, ability_word, keyword, "
+                             "keyword_parameter, trigger_condition, cost, effect, targets) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            stats["abilities"] += len(rows)
+        conn.commit()
+    finally:
+        conn.close()
+
+    stats["parse_seconds"] = parse_seconds
+    stats["cards_per_second"] = stats["cards"] / max(parse_seconds, 1e-9)
+    stats["structured_fraction"] = 1 - stats["unparsed"] / max(stats["abilities"], 1)
+    stats["keyword_recall"] = stats["keyword_lines_recognised"] / max(stats["scryfall_keyword_lines"], 1)
+    logger.info(f"Parsed {stats['abilities']} abilities from {stats['cards_with_text']} cards "
+                f"in {parse_seconds:.2f}s ({stats['cards_per_second']:.0f} cards/s)")
+    return stats
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Parse card oracle text into the card_abilities table and report coverage.")
+    parser.add_argument("--db", default="db/mtg_cards.sqlite", help="Card database (default: db/mtg_cards.sqlite)")
+    args = parser.parse_args()
+
+    stats = process_abilities(args.db)
+    print(f"Cards: {stats['cards']} ({stats['cards_with_text']} with oracle text)")
+    print(f"Abilities: {stats['abilities']}")
+    for kind, count in sorted(stats["by_kind"].items(), key=lambda item: -item[1]):
+        print(f"  {kind:<10} {count:>7} ({count / max(stats['abilities'], 1):.1%})")
+    print(f"Structured: {stats['structured_fraction']:.1%} ({stats['unparsed']} lines still look like triggers or activations)")
+    print(f"Keyword lines recognised: {stats['keyword_recall']:.1%} of {stats['scryfall_keyword_lines']}")
+    print(f"Throughput: {stats['cards_per_second']:.0f} cards/s")
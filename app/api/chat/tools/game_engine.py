@@ -0,0 +1,229 @@
+from dataclasses import dataclass
+from typing import Dict, List
+
+from app.api.chat.tools.game_state_schema import Event, GameEvents, GameState, Scenario, ScenarioEvents, State
+
+PLAYERS = ["you", "opponent"]
+
+# Turn structure (rule 500.1), in order
+STEPS = [
+    "untap", "upkeep", "draw",
+    "main phase 1",
+    "beginning of combat", "declare attackers", "declare blockers", "combat damage", "end of combat",
+    "main phase 2",
+    "end step", "cleanup",
+]
+
+STEP_ALIASES = {
+    "beginning phase": "untap",
+    "main phase": "main phase 1",
+    "precombat main phase": "main phase 1",
+    "first main phase": "main phase 1",
+    "combat": "beginning of combat",
+    "combat damage step": "combat damage",
+    "postcombat main phase": "main phase 2",
+    "second main phase": "main phase 2",
+    "end": "end step",
+    "end of turn": "end step",
+    "ending phase": "end step",
+    "cleanup step": "cleanup",
+}
+
+ZONES = ["battlefield", "graveyard", "exile"]
+
+
+class IllegalEventError(ValueError):
+    """An event that can't happen in the current game state."""
+
+
+@dataclass
+class StackObject:
+    name: str
+    controller: str
+    kind: str  # "spell", "permanent spell", "ability", "copy" or "permanent copy"
+
+
+def normalize_step(step: str) -> str:
+    step = step.strip().lower()
+    step = STEP_ALIASES.get(step, step)
+    if step.endswith(" step") and step[:-5] in STEPS:
+        step = step[:-5]
+    if step not in STEPS:
+        raise IllegalEventError(f"Unknown step: {step!r}")
+    return step
+
+
+class GameEngine:
+    """
+    Deterministic model of zones, steps, the stack and triggered abilities.
+
+    Each event is applied in order and produces one or more snapshots. The stack
+    resolves last in, first out, triggered abilities wait until a player would
+    receive priority and then go on the stack in APNAP order (rule 603.3b), and
+    events that break timing rules raise IllegalEventError.
+    """
+
+    def __init__(self, step: str = "main phase 1", active_player: str = "you",
+                 battlefield: List[str] = None, graveyard: List[str] = None, exile: List[str] = None):
+        self.step = normalize_step(step)
+        self.active_player = self._check_player(active_player)
+        self.zones: Dict[str, List[str]] = {
+            "battlefield": list(battlefield or []),
+            "graveyard": list(graveyard or []),
+            "exile": list(exile or []),
+        }
+        self.stack: List[StackObject] = []
+        self.triggered: List = []
+        self.resolved: List[str] = []
+
+    def _check_player(self, player: str) -> str:
+        player = player.strip().lower()
+        if player not in PLAYERS:
+            raise IllegalEventError(f"Unknown player: {player!r} (expected one of {PLAYERS})")
+        return player
+
+    def snapshot(self, label: str) -> State:
+        return State(
+            label=label,
+            step=self.step,
+            battlefield=list(self.zones["battlefield"]),
+            stack=[item.name for item in self.stack],
+            graveyard=list(self.zones["graveyard"]),
+            exile=list(self.zones["exile"]),
+            triggered=[trigger.ability for trigger in self.triggered],
+            resolved=list(self.resolved),
+        )
+
+    def _find_on_stack(self, name: str) -> int:
+        lowered = name.strip().lower()
+        for index in range(len(self.stack) - 1, -1, -1):
+            if self.stack[index].name.lower() == lowered:
+                return index
+        raise IllegalEventError(f"{name!r} is not on the stack")
+
+    def _remove_from_zones(self, name: str):
+        lowered = name.strip().lower()
+        for cards in self.zones.values():
+            for card in cards:
+                if card.lower() == lowered:
+                    cards.remove(card)
+                    return
+
+    def _check_sorcery_timing(self, event: Event):
+        action = "cast" if event.type == "cast" else "activated"
+        if self.stack:
+            raise IllegalEventError(f"{event.object!r} can only be {action} while the stack is empty")
+        if self.step not in ("main phase 1", "main phase 2"):
+            raise IllegalEventError(f"{event.object!r} can only be {action} in a main phase, not {self.step}")
+        if event.controller != self.active_player:
+            raise IllegalEventError(f"{event.object!r} can only be {action} during its controller's turn")
+
+    def _resolve_top(self):
+        if not self.stack:
+            raise IllegalEventError("Nothing to resolve: the stack is empty")
+        item = self.stack.pop()
+        if item.kind in ("permanent spell", "permanent copy"):
+            # A resolving copy of a permanent spell becomes a token (rule 608.3f)
+            self.zones["battlefield"].append(item.name)
+        elif item.kind == "spell":
+            self.zones["graveyard"].append(item.name)
+        # Abilities and copies of spells cease to exist when they leave the stack
+        self.resolved.append(item.name)
+        return item
+
+    def _advance_step(self, target: str = None):
+        if self.stack:
+            raise IllegalEventError(f"Can't leave {self.step} while the stack isn't empty")
+        target = normalize_step(target) if target else STEPS[(STEPS.index(self.step) + 1) % len(STEPS)]
+        if STEPS.index(target) <= STEPS.index(self.step):
+            self.active_player = PLAYERS[(PLAYERS.index(self.active_player) + 1) % len(PLAYERS)]
+        self.step = target
+
+    def _put_triggers_on_stack(self):
+        # APNAP: the active player's triggers go on first, so the nonactive player's resolve first
+        order = PLAYERS[PLAYERS.index(self.active_player):] + PLAYERS[:PLAYERS.index(self.active_player)]
+        for player in order:
+            for trigger in self.triggered:
+                if trigger.controller == player:
+                    self.stack.append(StackObject(trigger.ability, player, "ability"))
+        self.triggered = []
+
+    def apply(self, event: Event) -> List[State]:
+        event = event.model_copy(update={"controller": self._check_player(event.controller)})
+        self.resolved = []
+        label = event.label or f"{event.type.capitalize()} {event.object}".strip()
+
+        if event.type in ("cast", "activate"):
+            if event.sorcery_speed:
+                self._check_sorcery_timing(event)
+            if event.type == "cast":
+                self._remove_from_zones(event.object)
+                kind = "permanent spell" if event.permanent else "spell"
+            else:
+                kind = "ability"
+            self.stack.append(StackObject(event.object, event.controller, kind))
+        elif event.type == "copy":
+            original = self.stack[self._find_on_stack(event.object)]
+            kind = {"permanent spell": "permanent copy", "spell": "copy"}.get(original.kind, original.kind)
+            self.stack.append(StackObject(f"Copy of {original.name}", event.controller, kind))
+        elif event.type == "counter":
+            if event.by:
+                if not self.stack or self.stack[-1].name.lower() != event.by.strip().lower():
+                    raise IllegalEventError(f"{event.by!r} can't resolve: it isn't on top of the stack")
+                self._resolve_top()
+            countered = self.stack.pop(self._find_on_stack(event.object))
+            if countered.kind in ("spell", "permanent spell"):
+                self.zones["graveyard"].append(countered.name)
+        elif event.type == "resolve":
+            if event.object and (not self.stack or self.stack[-1].name.lower() != event.object.strip().lower()):
+                top = self.stack[-1].name if self.stack else "nothing"
+                raise IllegalEventError(f"{event.object!r} can't resolve: the top of the stack is {top!r}")
+            label = event.label or f"Resolve {self._resolve_top().name}"
+        elif event.type == "pass":
+            # All players pass in succession: the top object resolves, or the step ends
+            if self.stack:
+                label = event.label or f"All players pass; {self._resolve_top().name} resolves"
+            else:
+                self._advance_step()
+                label = event.label or f"All players pass; move to {self.step}"
+        elif event.type == "move":
+            destination = event.to.strip().lower()
+            self._remove_from_zones(event.object)
+            if destination in ZONES:
+                self.zones[destination].append(event.object)
+            elif destination not in ("hand", "library"):
+                raise IllegalEventError(f"Unknown zone: {event.to!r}")
+        elif event.type == "step":
+            self._advance_step(event.object or event.to)
+            label = event.label or f"Move to {self.step}"
+
+        states = []
+        if event.triggers:
+            for trigger in event.triggers:
+                self.triggered.append(trigger.model_copy(update={"controller": self._check_player(trigger.controller)}))
+            states.append(self.snapshot(label))
+            self.resolved = []
+            self._put_triggers_on_stack()
+            states.append(self.snapshot("Put triggered abilities on the stack"))
+        else:
+            states.append(self.snapshot(label))
+        return states
+
+    def run(self, events: List[Event]) -> List[State]:
+        states = []
+        for index, event in enumerate(events):
+            try:
+                states.extend(self.apply(event))
+            except IllegalEventError as e:
+                raise IllegalEventError(f"Event {index + 1} ({event.type} {event.object!r}): {e}") from e
+        return states
+
+
+def simulate_scenario(scenario: ScenarioEvents) -> Scenario:
+    engine = GameEngine(scenario.step, scenario.active_player, scenario.battlefield, scenario.graveyard, scenario.exile)
+    return Scenario(assumptions=scenario.assumptions, states=engine.run(scenario.events))
+
+
+def simulate(game_events: GameEvents) -> GameState:
+    """Compute the states for every scenario. Raises IllegalEventError if any event sequence is illegal."""
+    return GameState(scenarios=[simulate_scenario(scenario) for scenario in game_events.scenarios])
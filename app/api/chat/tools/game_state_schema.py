@@ -0,0 +1,163 @@
+import json
+from typing import List, Literal, Optional, Tuple
+
+from pydantic import BaseModel, Field, ValidationError
+
+
+class State(BaseModel):
+    label: str = Field(..., description="What just happened, e.g. 'Trigger Ulalek'")
+    step: str = Field(..., description="Current phase or step, e.g. 'main phase 1', 'declare attackers'")
+    battlefield: List[str] = Field(default_factory=list)
+    stack: List[str] = Field(default_factory=list, description="Bottom to top")
+    graveyard: List[str] = Field(default_factory=list)
+    exile: List[str] = Field(default_factory=list)
+    triggered: List[str] = Field(default_factory=list, description="Abilities that triggered but aren't on the stack yet")
+    resolved: List[str] = Field(default_factory=list, description="Spells and abilities that resolved to reach this state")
+
+
+class Scenario(BaseModel):
+    assumptions: List[str] = Field(default_factory=list)
+    states: List[State]
+
+
+class GameState(BaseModel):
+    scenarios: List[Scenario]
+
+
+# Non-strict so empty zones can be left out of the output entirely
+GAME_STATE_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "game_state",
+        "schema": GameState.model_json_schema(),
+        "strict": False,
+    },
+}
+
+GAME_STATE_FORMAT_INSTRUCTIONS = """Respond with a JSON object: {"scenarios": [{"assumptions": [...], "states": [{"label": ..., "step": ..., "battlefield": [...], "stack": [...], "graveyard": [...], "exile": [...], "triggered": [...], "resolved": [...]}]}]}.
+List the stack bottom to top. Leave out any zone or list that is empty."""
+
+
+def repair_game_state(data) -> Optional[GameState]:
+    """
+    Keep every scenario and state that validates and drop the ones that don't.
+
+    Used on output that was cut off or partly malformed, so one broken trailing
+    state doesn't throw away the states before it. Returns None if nothing is usable.
+    """
+    if not isinstance(data, dict):
+        return None
+
+    scenarios = []
+    for scenario in data.get("scenarios") or []:
+        if not isinstance(scenario, dict):
+            continue
+        states = []
+        for state in scenario.get("states") or []:
+            try:
+                states.append(State.model_validate(state))
+            except ValidationError:
+                continue
+        if states:
+            assumptions = [a for a in scenario.get("assumptions") or [] if isinstance(a, str)]
+            scenarios.append(Scenario(assumptions=assumptions, states=states))
+
+    return GameState(scenarios=scenarios) if scenarios else None
+
+
+class StateStreamParser:
+    """
+    Picks complete states out of a game state JSON object as it streams in.
+
+    Each character is scanned once and each state is parsed once, when its
+    closing brace arrives, so the work stays linear in the length of the output.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._position = 0
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._last_string = None
+        self._key = None
+        # (bracket, key it was opened under, offset) for each open object and array
+        self._open = []
+        self._scenario = -1
+
+    def feed(self, chunk: str) -> List[Tuple[int, State]]:
+        """Add the next chunk of text; returns (scenario index, state) for each state it completed."""
+        self.text += chunk
+        completed = []
+        for position in range(self._position, len(self.text)):
+            char = self.text[position]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    self._last_string = self.text[self._string_start + 1:position]
+            elif char == '"':
+                self._in_string = True
+                self._string_start = position
+            elif char == ":":
+                self._key = self._last_string
+            elif char in "{[":
+                parent = self._open[-1] if self._open else None
+                # An object in an array belongs to the array's key; anything in an object to the key before it
+                key = parent[1] if parent and parent[0] == "[" else self._key
+                if char == "{" and parent and parent[:2] == ("[", "scenarios"):
+                    self._scenario += 1
+                self._open.append((char, key, position))
+            elif char in "}]" and self._open:
+                bracket, key, start = self._open.pop()
+                if char == "}" and self._open and self._open[-1][:2] == ("[", "states"):
+                    try:
+                        completed.append((max(self._scenario, 0), State.model_validate(json.loads(self.text[start:position + 1]))))
+                    except (ValueError, ValidationError):
+                        pass
+        self._position = len(self.text)
+        return completed
+
+
+class Trigger(BaseModel):
+    ability: str = Field(..., description="e.g. \"Ulalek's triggered ability\"")
+    controller: str = Field("you", description="'you' or 'opponent'")
+
+
+class Event(BaseModel):
+    type: Literal["cast", "activate", "copy", "counter", "resolve", "pass", "move", "step", "action"]
+    object: str = Field("", description="The spell, ability, card or step the event is about")
+    controller: str = Field("you", description="'you' or 'opponent'")
+    permanent: bool = Field(False, description="cast: the spell becomes a permanent when it resolves")
+    sorcery_speed: bool = Field(False, description="cast/activate: only legal in a main phase with an empty stack")
+    by: str = Field("", description="counter: the spell or ability doing the countering, resolving now")
+    to: str = Field("", description="move: destination zone (battlefield, graveyard, exile, hand, library)")
+    triggers: List[Trigger] = Field(default_factory=list, description="Abilities that trigger on this event")
+    label: str = ""
+
+
+class ScenarioEvents(BaseModel):
+    assumptions: List[str] = Field(default_factory=list)
+    step: str = "main phase 1"
+    active_player: str = "you"
+    battlefield: List[str] = Field(default_factory=list)
+    graveyard: List[str] = Field(default_factory=list)
+    exile: List[str] = Field(default_factory=list)
+    events: List[Event]
+
+
+class GameEvents(BaseModel):
+    scenarios: List[ScenarioEvents]
+
+
+GAME_EVENTS_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "game_events",
+        "schema": GameEvents.model_json_schema(),
+        "strict": False,
+    },
+}
@@ -0,0 +1,592 @@
+import argparse
+import asyncio
+import json
+import random
+import re
+import statistics
+import time
+import uuid
+from typing import Any, List, Optional
+
+import pandas as pd
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+class ModelCallCounter(BaseCallbackHandler):
+    """Counts chat model round trips made while answering one question."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.calls += 1
+
+def load_questions(csv_file_path, limit, min_cards=0):
+    """Questions from the corpus, optionally only those naming at least min_cards distinct [[cards]]."""
+    df = pd.read_csv(csv_file_path, usecols=["body"])
+    questions = [
+        body for body in df["body"].dropna()
+        if body.strip() and len(set(re.findall(r'\[\[([^\]]+)\]\]', body))) >= min_cards
+    ]
+    return questions[:limit]
+
+def run_question(graph, question, configurable=None):
+    counter = ModelCallCounter()
+    start = time.perf_counter()
+    graph.invoke({"messages": [HumanMessage(content=question)]},
+                 config={"callbacks": [counter], "configurable": configurable or {}})
+    return counter.calls, time.perf_counter() - start
+
+def compare_graphs(variants, questions):
+    """variants maps a name to (compiled graph, configurable options)."""
+    print(f"{len(questions)} questions")
+    print(f"{'variant':<26} {'mean model calls':>17} {'median seconds':>15} {'p90 seconds':>12}")
+    results = {}
+    for name, (graph, configurable) in variants.items():
+        calls, seconds = zip(*(run_question(graph, question, configurable) for question in questions))
+        results[name] = {"calls": calls, "seconds": seconds}
+        p90 = sorted(seconds)[min(len(seconds) - 1, int(0.9 * len(seconds)))]
+        print(f"{name:<26} {statistics.mean(calls):>17.2f} {statistics.median(seconds):>15.2f} {p90:>12.2f}")
+    return results
+
+class StubChatModel(BaseChatModel):
+    """
+    Stands in for the agent model with a fixed latency and no API calls.
+
+    The first turn asks for a rules lookup and the second answers, so a question
+    exercises the model, tool and DB paths the way a real two-turn answer would.
+    Set lookups to script several turns of rules_lookup calls before the answer.
+    When streamed, the answer arrives one word every token_delay seconds after
+    the initial latency. A fraction uncertain_rate of answers hedge instead of
+    citing a rule, which a model cascade treats as low confidence. Usage is
+    reported at roughly four characters per token so costs can be estimated.
+    """
+    latency: float = 0.5
+    token_delay: float = 0.02
+    answer_words: int = 200
+    lookups: List[List[str]] = [["603.3"]]
+    uncertain_rate: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def _respond(self, messages: List[BaseMessage]) -> ChatResult:
+        turn = sum(1 for message in messages if isinstance(message, ToolMessage) and message.name == "rules_lookup")
+        if turn >= len(self.lookups):
+            opening = "I'm not sure, but" if random.random() < self.uncertain_rate else "Per rule 603.3,"
+            message = AIMessage(content=" ".join([opening] + self._answer_words()))
+        else:
+            message = AIMessage(content="", tool_calls=[
+                {"name": "rules_lookup", "args": {"rule_numbers": self.lookups[turn]}, "id": f"call_{uuid.uuid4().hex}"}
+            ])
+        input_tokens = sum(len(str(m.content)) for m in messages) // 4
+        output_tokens = len(str(message.content)) // 4 + 10
+        message.usage_metadata = {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency)
+        return self._respond(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._respond(messages)
+
+    def _answer_words(self):
+        return [f"word{i}" for i in range(self.answer_words)]
+
+    def _chunks(self, messages: List[BaseMessage]):
+        message = self._respond(messages).generations[0].message
+        if message.tool_calls:
+            yield 0, AIMessageChunk(content="", tool_call_chunks=[
+                {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": i}
+                for i, call in enumerate(message.tool_calls)
+            ])
+            return
+        for i, word in enumerate(message.content.split(" ")):
+            yield self.token_delay, AIMessageChunk(content=word if i == 0 else f" {word}")
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any):
+        time.sleep(self.latency)
+        for delay, chunk in self._chunks(messages):
+            time.sleep(delay)
+            if run_manager and chunk.content:
+                run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any):
+        await asyncio.sleep(self.latency)
+        for delay, chunk in self._chunks(messages):
+            await asyncio.sleep(delay)
+            if run_manager and chunk.content:
+                await run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+
+async def run_concurrently(graph, questions, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(question):
+        async with semaphore:
+            await graph.ainvoke({"messages": [HumanMessage(content=question)]})
+
+    await asyncio.gather(*(run_one(question) for question in questions))
+
+def measure_throughput(questions, concurrency_levels, latency):
+    """Questions per second with a stub model: the blocking path one at a time, then the async path at each concurrency."""
+    from my_agent.agent import create_graph
+    from my_agent.utils import nodes
+
+    stub = StubChatModel(latency=latency)
+    nodes.model = nodes.sequential_model = stub
+    graph = create_graph()
+
+    print(f"{len(questions)} questions, stub model latency {latency * 1000:.0f} ms")
+    print(f"{'mode':<22} {'q/s':>8}")
+    start = time.perf_counter()
+    for question in questions:
+        graph.invoke({"messages": [HumanMessage(content=question)]})
+    print(f"{'sync, one at a time':<22} {len(questions) / (time.perf_counter() - start):>8.2f}")
+
+    for concurrency in concurrency_levels:
+        start = time.perf_counter()
+        asyncio.run(run_concurrently(graph, questions, concurrency))
+        print(f"{f'async x{concurrency}':<22} {len(questions) / (time.perf_counter() - start):>8.2f}")
+
+async def measure_first_token(graph, question):
+    from my_agent.agent import astream_answer
+
+    start = time.perf_counter()
+    first_token = None
+    async for event in astream_answer(question, compiled_graph=graph, bypass_cache=True):
+        if event["type"] == "token" and first_token is None:
+            first_token = time.perf_counter() - start
+    return first_token, time.perf_counter() - start
+
+def measure_time_to_first_token(questions, latency, token_delay):
+    """Seconds until the first answer token when streaming, against the full answer time invoke waits for."""
+    from my_agent.agent import create_graph
+    from my_agent.utils import nodes
+
+    stub = StubChatModel(latency=latency, token_delay=token_delay)
+    nodes.model = nodes.sequential_model = stub
+    graph = create_graph()
+
+    first_tokens, totals = [], []
+    for question in questions:
+        first_token, total = asyncio.run(measure_first_token(graph, question))
+        first_tokens.append(first_token)
+        totals.append(total)
+    print(f"{len(questions)} questions, stub latency {latency * 1000:.0f} ms, {token_delay * 1000:.0f} ms per token")
+    print(f"median time to first token: {statistics.median(first_tokens):.2f}s")
+    print(f"median time to full answer: {statistics.median(totals):.2f}s")
+
+def measure_answer_cache(questions, repeats, latency):
+    """Hit rate and per-question latency of the answer cache with a stub model, against bypassing it."""
+    import tempfile
+    from my_agent.agent import answer_question, create_graph
+    from my_agent.utils import answer_cache, nodes
+
+    nodes.model = nodes.sequential_model = StubChatModel(latency=latency)
+    graph = create_graph()
+    with tempfile.TemporaryDirectory() as cache_dir:
+        answer_cache._answer_cache = answer_cache.AnswerCache(path=f"{cache_dir}/answers.sqlite")
+        print(f"{len(questions)} questions x {repeats}, stub model latency {latency * 1000:.0f} ms")
+        print(f"{'mode':<10} {'median seconds':>15} {'mean seconds':>13}")
+        for name, bypass_cache in [("bypass", True), ("cached", False)]:
+            seconds = []
+            for _ in range(repeats):
+                for question in questions:
+                    start = time.perf_counter()
+                    answer_question(question, compiled_graph=graph, bypass_cache=bypass_cache)
+                    seconds.append(time.perf_counter() - start)
+            print(f"{name:<10} {statistics.median(seconds):>15.3f} {statistics.mean(seconds):>13.3f}")
+        print(answer_cache._answer_cache.stats.summary())
+
+def measure_context_ledger(questions, lookups):
+    """Tokens of tool results sent to the model per question, with and without the context ledger."""
+    from my_agent.agent import create_graph
+    from my_agent.api.rules_api import CHARS_PER_TOKEN
+    from my_agent.utils import nodes
+
+    nodes.model = nodes.sequential_model = StubChatModel(latency=0, lookups=lookups)
+    graph = create_graph()
+    print(f"{len(questions)} questions, rules_lookup turns: {lookups}")
+    print(f"{'mode':<16} {'tool result tokens/question':>28}")
+    totals = {}
+    for name, context_ledger in [("no ledger", False), ("context ledger", True)]:
+        tokens = []
+        for question in questions:
+            result = graph.invoke({"messages": [HumanMessage(content=question)]},
+                                  config={"configurable": {"context_ledger": context_ledger}})
+            tokens.append(sum(len(message.content) for message in result["messages"] if isinstance(message, ToolMessage)) / CHARS_PER_TOKEN)
+        totals[name] = statistics.mean(tokens)
+        print(f"{name:<16} {totals[name]:>28.0f}")
+    saved = totals["no ledger"] - totals["context ledger"]
+    print(f"saved {saved:.0f} tokens/question ({saved / totals['no ledger']:.0%})" if totals["no ledger"] else "no tool results")
+
+def measure_context_budget(questions, lookups, budget):
+    """Prompt tokens per model turn with the whole transcript resent, against trimming to a token budget."""
+    from my_agent.agent import create_graph
+    from my_agent.utils import nodes
+
+    nodes.model = nodes.sequential_model = StubChatModel(latency=0, lookups=lookups)
+    graph = create_graph()
+    print(f"{len(questions)} questions, rules_lookup turns: {lookups}")
+    for name, token_budget in [("unbounded", 10 ** 9), (f"budget {budget}", budget)]:
+        turns = []
+        for question in questions:
+            result = graph.invoke({"messages": [HumanMessage(content=question)]},
+                                  config={"configurable": {"context_token_budget": token_budget}})
+            turns.append(result["prompt_tokens"])
+        per_turn = [statistics.mean(turn[i] for turn in turns if len(turn) > i) for i in range(max(map(len, turns)))]
+        print(f"{name:<14} prompt tokens per turn: {' '.join(f'{tokens:.0f}' for tokens in per_turn)}  total {sum(per_turn):.0f}")
+
+# Hand-written smoke checks for each route. They are not a sample of real questions, so routing accuracy
+# comes from a labelled corpus sample instead (see write_routing_sample and --labels)
+ROUTING_EXAMPLES = [
+    ("What does ward do?", "definition"),
+    ("What is trample?", "definition"),
+    ("How does convoke work?", "definition"),
+    ("Define scry", "definition"),
+    ("What's the text of [[Pithing Needle]]?", "card_text"),
+    ("Rulings for [[Rest in Peace]]", "card_text"),
+    ("What does [[Leyline of the Void]] say?", "card_text"),
+    # Slang that only partially matches a card name ("Blink Dog") is left to the agent
+    ("What does blink do?", "interaction"),
+    ("Does [[Rest in Peace]] stop [[Leyline of the Void]]?", "interaction"),
+    ("If I copy a spell with [[Fork]], do I get a trigger?", "interaction"),
+    ("Can I respond to the ward trigger by sacrificing the creature?", "interaction"),
+    ("What happens when trample damage is assigned to a creature with protection?", "interaction"),
+    ("My opponent cast a spell and I countered it. Does the cast trigger still resolve?", "interaction"),
+]
+
+def route_question(question):
+    from my_agent.utils import nodes
+    from my_agent.utils.tools import extract_bracketed_card_names
+    return nodes.route_question({"question": question, "card_names": extract_bracketed_card_names(question)})["route"]
+
+def write_routing_sample(csv_file_path, output_path, size):
+    """
+    Write a random sample of corpus questions to label, one JSON object per line
+    with the router's prediction and an empty "route" to fill in by hand.
+    """
+    df = pd.read_csv(csv_file_path, usecols=["body"])
+    bodies = [body for body in df["body"].dropna() if body.strip()]
+    random.seed(0)
+    with open(output_path, "w", encoding="utf-8") as f:
+        for question in random.sample(bodies, min(size, len(bodies))):
+            f.write(json.dumps({"question": question, "predicted": route_question(question), "route": ""}, ensure_ascii=False) + "\n")
+    print(f"wrote {min(size, len(bodies))} questions to {output_path}; set each \"route\" to definition, card_text or interaction")
+
+def load_routing_labels(path):
+    with open(path, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    return [(row["question"], row["route"]) for row in rows if row.get("route")]
+
+def report_routing(name, labelled):
+    """Accuracy, and how often each route was picked wrongly, over (question, expected route) pairs."""
+    from collections import Counter
+    wrong = Counter()
+    for question, expected in labelled:
+        predicted = route_question(question)
+        if predicted != expected:
+            wrong[(expected, predicted)] += 1
+            print(f"misrouted as {predicted} (expected {expected}): {question[:120]}")
+    correct = len(labelled) - sum(wrong.values())
+    print(f"routing accuracy on {len(labelled)} {name}: {correct / len(labelled):.0%}" if labelled else f"no {name}")
+    for (expected, predicted), count in sorted(wrong.items()):
+        print(f"  {expected} -> {predicted}: {count}")
+
+def measure_routing(questions, latency, cheap_latency, labels=None):
+    """Routing accuracy on a labelled corpus sample, the route mix on the corpus, and answer latency with routing on and off."""
+    from collections import Counter
+    from my_agent.agent import create_graph
+    from my_agent.utils import nodes
+
+    report_routing("smoke checks", ROUTING_EXAMPLES)
+    if labels:
+        report_routing(f"labelled corpus questions ({labels})", load_routing_labels(labels))
+    else:
+        print("no labelled corpus sample given (--labels); the smoke checks above are not an accuracy figure")
+
+    start = time.perf_counter()
+    routes = Counter(route_question(question) for question in questions)
+    print(f"corpus routes over {len(questions)} questions: {dict(routes)}, "
+          f"{(time.perf_counter() - start) / max(len(questions), 1) * 1000:.1f} ms/question to route")
+
+    nodes.model = nodes.sequential_model = StubChatModel(latency=latency)
+    nodes.cheap_model = StubChatModel(latency=cheap_latency, lookups=[])
+    graph = create_graph()
+    sample = [question for question, _ in ROUTING_EXAMPLES] + questions
+    print(f"stub latency: agent {latency * 1000:.0f} ms, cheap model {cheap_latency * 1000:.0f} ms")
+    for name, routing in [("agent for all", False), ("routed", True)]:
+        seconds = []
+        for question in sample:
+            start = time.perf_counter()
+            graph.invoke({"messages": [HumanMessage(content=question)]}, config={"configurable": {"routing": routing}})
+            seconds.append(time.perf_counter() - start)
+        print(f"{name:<14} mean {statistics.mean(seconds):.3f}s  median {statistics.median(seconds):.3f}s")
+
+def measure_cascade(questions, small_latency, large_latency, uncertain_rate):
+    """Latency, cost and escalation rate of the agent with the large model only, against the small-first cascade, with stub models."""
+    from my_agent.agent import create_graph
+    from my_agent.utils import nodes
+    from my_agent.utils.cascade import CascadeMetrics, ModelCascade
+
+    random.seed(0)
+    variants = {
+        "gpt-4o only": [("gpt-4o", StubChatModel(latency=large_latency))],
+        "cascade": [("gpt-4o-mini", StubChatModel(latency=small_latency, uncertain_rate=uncertain_rate)),
+                    ("gpt-4o", StubChatModel(latency=large_latency))],
+    }
+    print(f"{len(questions)} questions, stub latency: small {small_latency * 1000:.0f} ms, large {large_latency * 1000:.0f} ms, "
+          f"{uncertain_rate:.0%} of small model answers unsure")
+    print(f"{'variant':<14} {'mean seconds':>13} {'cost/question':>14} {'escalation rate':>16}")
+    for name, models in variants.items():
+        metrics = CascadeMetrics()
+        nodes.model = nodes.sequential_model = ModelCascade("agent", models, metrics=metrics)
+        graph = create_graph()
+        seconds = []
+        for question in questions:
+            start = time.perf_counter()
+            graph.invoke({"messages": [HumanMessage(content=question)]})
+            seconds.append(time.perf_counter() - start)
+        summary = metrics.summary()["agent"]
+        print(f"{name:<14} {statistics.mean(seconds):>13.3f} {summary['cost_usd'] / len(questions):>14.5f} {summary['escalation_rate']:>16.0%}")
+
+def measure_budget(questions, lookups, max_steps, latency):
+    """Steps, latency and exhausted-budget rate per question, unbounded against capped at max_steps, with a stub model that keeps looking rules up."""
+    from my_agent.agent import create_graph
+    from my_agent.utils import nodes
+    from my_agent.utils.budget import BudgetMetrics
+
+    nodes.model = nodes.sequential_model = StubChatModel(latency=latency, lookups=lookups)
+    nodes.answer_model = StubChatModel(latency=latency, lookups=[])
+    graph = create_graph()
+    print(f"{len(questions)} questions, {len(lookups)} rules_lookup turns before the stub answers, stub latency {latency * 1000:.0f} ms")
+    print(f"{'variant':<14} {'mean seconds':>13} {'p95 seconds':>12} {'mean steps':>11} {'exhausted':>10}")
+    for name, steps in [("unbounded", len(lookups) + 1), (f"{max_steps} steps", max_steps)]:
+        nodes.budget_metrics = metrics = BudgetMetrics()
+        seconds, turns = [], []
+        for question in questions:
+            start = time.perf_counter()
+            result = graph.invoke({"messages": [HumanMessage(content=question)]}, config={"configurable": {"max_steps": steps}})
+            seconds.append(time.perf_counter() - start)
+            turns.append(len(result["prompt_tokens"]))
+        p95 = statistics.quantiles(seconds, n=20)[-1] if len(seconds) > 1 else seconds[0]
+        print(f"{name:<14} {statistics.mean(seconds):>13.3f} {p95:>12.3f} {statistics.mean(turns):>11.1f} "
+              f"{metrics.summary()['exhausted_rate']:>10.0%}")
+
+def check_card_lookups():
+    """
+    recognize_cards on a scratch database, exact and partial, one after the other
+    and concurrently: exact=True must skip the partial-name fallback, and
+    concurrent exact and partial lookups of the same names must not share a result.
+    """
+    import os
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+    from my_agent.api.mtg_cards_api import insert_card_into_db, setup_card_database
+    from my_agent.utils.tools import recognize_cards
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        db_path = os.path.join(db_dir, "cards.sqlite")
+        setup_card_database(db_path)
+        insert_card_into_db(db_path, {"oracle_id": "blink-dog", "name": "Blink Dog", "type_line": "Creature — Dog"})
+
+        def names(card_names, exact):
+            return [card["name"] for card in recognize_cards(card_names, db_path, exact=exact)]
+
+        assert names(["blink"], exact=False) == ["Blink Dog"], "partial lookup should find Blink Dog"
+        assert names(["blink"], exact=True) == [], "exact lookup should not match part of a name"
+        assert names(["blink dog"], exact=True) == ["Blink Dog"], "exact lookup should ignore case"
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(lambda exact: (exact, names(["blink"], exact)), [True, False] * 8))
+        assert all(found == ([] if exact else ["Blink Dog"]) for exact, found in results), "exact and partial lookups shared a result"
+    print("card lookups: exact and partial lookups OK, alone and concurrently")
+
+def measure_burst(questions, burst, latency):
+    """
+    Model calls and wall time when each question is asked burst times at once, with and without single-flight.
+
+    The async path runs the burst as concurrent coroutines and the sync path on
+    a thread per caller; the rules lookups behind the stub's tool calls are
+    coalesced the same way.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from my_agent.agent import aanswer_question, answer_question, create_graph
+    from my_agent.api import single_flight
+    from my_agent.utils import nodes
+
+    nodes.model = nodes.sequential_model = StubChatModel(latency=latency)
+    graph = create_graph()
+    flights = [single_flight.question_flights, single_flight.card_flights, single_flight.rule_flights]
+    asked = [question for question in questions for _ in range(burst)]
+    random.seed(0)
+    random.shuffle(asked)
+
+    async def run_async(counter):
+        await asyncio.gather(*(aanswer_question(question, {"callbacks": [counter]}, compiled_graph=graph, bypass_cache=True)
+                               for question in asked))
+
+    def run_threads(counter):
+        with ThreadPoolExecutor(max_workers=len(asked)) as pool:
+            list(pool.map(lambda question: answer_question(question, {"callbacks": [counter]}, compiled_graph=graph, bypass_cache=True), asked))
+
+    print(f"{len(questions)} questions x {burst} concurrent askers, stub model latency {latency * 1000:.0f} ms")
+    print(f"{'mode':<24} {'model calls':>12} {'seconds':>8} {'questions shared':>17} {'rule lookups shared':>20}")
+    for path, run in [("async", lambda counter: asyncio.run(run_async(counter))), ("threads", run_threads)]:
+        for enabled in (False, True):
+            for flight in flights:
+                flight.enabled = enabled
+                flight.reset()
+            counter = ModelCallCounter()
+            start = time.perf_counter()
+            run(counter)
+            seconds = time.perf_counter() - start
+            name = f"{path}, {'single-flight' if enabled else 'independent'}"
+            print(f"{name:<24} {counter.calls:>12} {seconds:>8.2f} {single_flight.question_flights.summary()['shared_rate']:>17.0%} "
+                  f"{single_flight.rule_flights.summary()['shared_rate']:>20.0%}")
+
+def measure_runtime_overhead(requests):
+    """Per-request setup time: building the model client, tools and executor each time, against the shared runtime."""
+    import main
+    from langchain_openai import ChatOpenAI
+
+    def build_per_request():
+        llm = ChatOpenAI(temperature=0, model="gpt-4o")
+        return main.create_react_agent(llm, main.create_agent_tools())
+
+    def shared_runtime():
+        return main.get_agent_runtime().agent_executor
+
+    print(f"{requests} requests, setup only (no model calls)")
+    print(f"{'mode':<22} {'ms/request':>11}")
+    for name, setup in [("per-request build", build_per_request), ("shared runtime", shared_runtime)]:
+        start = time.perf_counter()
+        for _ in range(requests):
+            setup()
+        print(f"{name:<22} {(time.perf_counter() - start) / requests * 1000:>11.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the agent graph.")
+    parser.add_argument("--file", default="data/mtg_rules_questions.csv", help="Question CSV (default: data/mtg_rules_questions.csv)")
+    parser.add_argument("--limit", type=int, default=20, help="Number of questions (default: 20)")
+    parser.add_argument("--min-cards", type=int, default=0, help="Only questions naming at least this many [[cards]] (default: 0)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    live_parser = subparsers.add_parser("live", help="Model round trips and wall-clock time per question for graph variants (needs OPENAI_API_KEY)")
+    live_parser.add_argument("--game-state", action="store_true", help="Also benchmark retrieval with game state construction")
+
+    throughput_parser = subparsers.add_parser("throughput", help="Questions per second, sync vs async, with a stub model")
+    throughput_parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 64], help="Concurrent questions for the async path (default: 1 8 64)")
+    throughput_parser.add_argument("--latency-ms", type=float, default=500, help="Stub model latency per call (default: 500)")
+
+    ttft_parser = subparsers.add_parser("ttft", help="Time to first answer token when streaming, with a stub model")
+    ttft_parser.add_argument("--latency-ms", type=float, default=500, help="Stub model latency before the first token (default: 500)")
+    ttft_parser.add_argument("--token-delay-ms", type=float, default=20, help="Stub delay between tokens (default: 20)")
+
+    runtime_parser = subparsers.add_parser("runtime", help="Per-request setup cost of main's agent, rebuilt vs shared")
+    runtime_parser.add_argument("--requests", type=int, default=50, help="Number of simulated requests (default: 50)")
+
+    cache_parser = subparsers.add_parser("cache", help="Answer cache hit rate and latency on repeated questions, with a stub model")
+    cache_parser.add_argument("--repeats", type=int, default=3, help="Times each question is asked (default: 3)")
+    cache_parser.add_argument("--latency-ms", type=float, default=500, help="Stub model latency per call (default: 500)")
+
+    ledger_parser = subparsers.add_parser("ledger", help="Tool result tokens saved by the context ledger, with a stub model that repeats lookups")
+    ledger_parser.add_argument("--lookups", nargs="+", default=["405,603", "405", "603.3,405"],
+                               help="Comma-separated rule numbers per rules_lookup turn (default: 405,603 405 603.3,405)")
+
+    context_parser = subparsers.add_parser("context", help="Prompt tokens per turn, unbounded vs trimmed to a budget, with a stub model")
+    context_parser.add_argument("--lookups", nargs="+", default=["405", "603", "603.3", "116", "117"],
+                                help="Comma-separated rule numbers per rules_lookup turn (default: 405 603 603.3 116 117)")
+    context_parser.add_argument("--budget", type=int, default=2000, help="Context token budget (default: 2000)")
+
+    route_parser = subparsers.add_parser("route", help="Question router accuracy and latency savings, with stub models")
+    route_parser.add_argument("--latency-ms", type=float, default=500, help="Stub agent model latency per call (default: 500)")
+    route_parser.add_argument("--cheap-latency-ms", type=float, default=150, help="Stub cheap model latency (default: 150)")
+    route_parser.add_argument("--labels", help="JSONL of corpus questions with a hand-set \"route\", for routing accuracy")
+    route_parser.add_argument("--write-sample", metavar="PATH", help="Write a random corpus sample to label to PATH and exit")
+    route_parser.add_argument("--sample-size", type=int, default=200, help="Questions in the sample to label (default: 200)")
+
+    cascade_parser = subparsers.add_parser("cascade", help="Cost, latency and escalation rate of the model cascade, with stub models")
+    cascade_parser.add_argument("--small-latency-ms", type=float, default=200, help="Stub small model latency per call (default: 200)")
+    cascade_parser.add_argument("--large-latency-ms", type=float, default=800, help="Stub large model latency per call (default: 800)")
+    cascade_parser.add_argument("--uncertain-rate", type=float, default=0.3, help="Fraction of small model answers that hedge (default: 0.3)")
+
+    burst_parser = subparsers.add_parser("burst", help="Model calls and time when many players ask the same question at once, with and without single-flight")
+    burst_parser.add_argument("--burst", type=int, default=20, help="Concurrent askers per question (default: 20)")
+    burst_parser.add_argument("--latency-ms", type=float, default=500, help="Stub model latency per call (default: 500)")
+
+    subparsers.add_parser("cards", help="Check exact and partial card lookups through recognize_cards on a scratch database")
+
+    budget_parser = subparsers.add_parser("budget", help="Latency and steps per question with and without a step budget, with a stub model")
+    budget_parser.add_argument("--lookups", nargs="+", default=["405", "603", "603.3", "116", "117", "118", "119", "120"],
+                               help="Comma-separated rule numbers per rules_lookup turn (default: 405 603 603.3 116 117 118 119 120)")
+    budget_parser.add_argument("--max-steps", type=int, default=3, help="Step budget to compare against unbounded (default: 3)")
+    budget_parser.add_argument("--latency-ms", type=float, default=100, help="Stub model latency per call (default: 100)")
+    args = parser.parse_args()
+
+    if args.command == "runtime":
+        measure_runtime_overhead(args.requests)
+        raise SystemExit
+    if args.command == "cards":
+        check_card_lookups()
+        raise SystemExit
+
+    questions = load_questions(args.file, args.limit, args.min_cards)
+    if args.command == "throughput":
+        measure_throughput(questions, args.concurrency, args.latency_ms / 1000)
+        raise SystemExit
+    if args.command == "ttft":
+        measure_time_to_first_token(questions, args.latency_ms / 1000, args.token_delay_ms / 1000)
+        raise SystemExit
+    if args.command == "ledger":
+        measure_context_ledger(questions, [turn.split(",") for turn in args.lookups])
+        raise SystemExit
+    if args.command == "context":
+        measure_context_budget(questions, [turn.split(",") for turn in args.lookups], args.budget)
+        raise SystemExit
+    if args.command == "route":
+        if args.write_sample:
+            write_routing_sample(args.file, args.write_sample, args.sample_size)
+        else:
+            measure_routing(questions, args.latency_ms / 1000, args.cheap_latency_ms / 1000, args.labels)
+        raise SystemExit
+    if args.command == "cascade":
+        measure_cascade(questions, args.small_latency_ms / 1000, args.large_latency_ms / 1000, args.uncertain_rate)
+        raise SystemExit
+    if args.command == "burst":
+        measure_burst(questions, args.burst, args.latency_ms / 1000)
+        raise SystemExit
+    if args.command == "budget":
+        measure_budget(questions, [turn.split(",") for turn in args.lookups], args.max_steps, args.latency_ms / 1000)
+        raise SystemExit
+    if args.command == "cache":
+        measure_answer_cache(questions, args.repeats, args.latency_ms / 1000)
+        raise SystemExit
+
+    from my_agent.agent import create_graph
+
+    agent_loop = create_graph(retrieval=False)
+    retrieval = create_graph(retrieval=True, prefetch_game_state=False)
+    variants = {
+        "agent loop, one tool/turn": (agent_loop, {"parallel_tool_calls": False}),
+        "agent loop": (agent_loop, {}),
+        "retrieval DAG": (retrieval, {}),
+    }
+    if args.game_state:
+        variants["retrieval DAG + state"] = (create_graph(retrieval=True, prefetch_game_state=True), {})
+
+    compare_graphs(variants, questions)
+
+    from my_agent.utils.cascade import cascade_metrics
+    from my_agent.utils.prompt_cache import prompt_cache_metrics
+    for node, usage in cascade_metrics.summary().items():
+        print(f"cascade {node}: {usage['calls']} calls, escalation rate {usage['escalation_rate']:.0%}, {usage['tokens']} tokens, ${usage['cost_usd']:.4f}")
+    print("prompt cache usage:")
+    for name, usage in prompt_cache_metrics.summary().items():
+        print(f"  {name:<14} {usage['calls']:>5} calls {usage['input_tokens']:>9} input tokens {usage['cached_tokens']:>9} cached  hit rate {usage['hit_rate']:.0%}")
@@ -0,0 +1,71 @@
+import argparse
+import ast
+import statistics
+import subprocess
+import time
+
+import pandas as pd
+import tiktoken
+from langchain.schema import HumanMessage, SystemMessage
+from langchain_openai import ChatOpenAI
+
+from app.api.chat.tools.game_state_constructor import build_system_prompt
+
+CONSTRUCTOR_PATH = "app/api/chat/tools/game_state_constructor.py"
+
+def load_questions(csv_file_path, limit):
+    df = pd.read_csv(csv_file_path, usecols=["body"])
+    return [body for body in df["body"].dropna() if body.strip()][:limit]
+
+def root_commit():
+    return subprocess.run(["git", "rev-list", "--max-parents=0", "HEAD"], capture_output=True, text=True, check=True).stdout.split()[0]
+
+def load_static_prompt(ref):
+    """
+    The static system prompt as shipped at ref: the string assigned to
+    system_prompt in GameStateConstructor.construct_game_state, the same for every question.
+    """
+    source = subprocess.run(["git", "show", f"{ref}:{CONSTRUCTOR_PATH}"], capture_output=True, text=True, check=True).stdout
+    for node in ast.walk(ast.parse(source)):
+        if (isinstance(node, ast.Assign) and any(getattr(target, "id", None) == "system_prompt" for target in node.targets)
+                and isinstance(node.value, ast.Constant)):
+            return node.value.value
+    raise ValueError(f"No static system_prompt in {CONSTRUCTOR_PATH} at {ref}")
+
+def time_call(model, system_prompt, question):
+    start = time.perf_counter()
+    model.invoke([SystemMessage(content=system_prompt), HumanMessage(content=question)])
+    return time.perf_counter() - start
+
+def compare_prompts(questions, static_prompt, live=False):
+    encoding = tiktoken.encoding_for_model("gpt-4o")
+    model = ChatOpenAI(model_name='gpt-4o', temperature=0) if live else None
+    results = {"static": {"tokens": [], "seconds": []}, "retrieved": {"tokens": [], "seconds": []}}
+
+    for question in questions:
+        prompts = {
+            "static": static_prompt,
+            "retrieved": build_system_prompt(question),
+        }
+        for name, system_prompt in prompts.items():
+            results[name]["tokens"].append(len(encoding.encode(system_prompt)))
+            if live:
+                results[name]["seconds"].append(time_call(model, system_prompt, question))
+
+    print(f"{len(questions)} questions")
+    print(f"{'prompt':<10} {'mean tokens':>12} {'median tokens':>14} {'median latency (s)':>19}")
+    for name, values in results.items():
+        latency = f"{statistics.median(values['seconds']):.2f}" if values["seconds"] else "-"
+        print(f"{name:<10} {statistics.mean(values['tokens']):>12.0f} {statistics.median(values['tokens']):>14.0f} {latency:>19}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the static game state prompt with per-query retrieved rule excerpts.")
+    parser.add_argument("--file", default="data/mtg_rules_questions.csv", help="Question CSV (default: data/mtg_rules_questions.csv)")
+    parser.add_argument("--limit", type=int, default=50, help="Number of questions (default: 50)")
+    parser.add_argument("--live", action="store_true", help="Also time real game state calls (needs OPENAI_API_KEY)")
+    parser.add_argument("--baseline-ref", default=None,
+                        help="Git revision whose static prompt to compare against (default: the repository's first commit)")
+    args = parser.parse_args()
+
+    compare_prompts(load_questions(args.file, args.limit), load_static_prompt(args.baseline_ref or root_commit()), args.live)
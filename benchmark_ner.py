@@ -0,0 +1,198 @@
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+# Each snippet runs in a fresh interpreter so import caches and loaded weights don't leak between runs
+STARTUP_SNIPPETS = {
+    "import main": "import main",
+    "import main + NER warm-up (eager loading)": "import main, ner_model; ner_model.warm_up()",
+}
+
+MEASURE_TEMPLATE = """
+import json, resource, time
+start = time.perf_counter()
+{snippet}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}))
+"""
+
+def measure_startup(snippet: str, repeats: int) -> dict:
+    runs = []
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, "-c", MEASURE_TEMPLATE.format(snippet=snippet)],
+            capture_output=True, text=True, check=True
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        "seconds": min(run["seconds"] for run in runs),
+        "max_rss_mb": max(run["max_rss_mb"] for run in runs),
+    }
+
+def run_startup_benchmark(repeats: int):
+    print(f"{'scenario':<45} {'seconds':>8} {'max RSS (MB)':>13}")
+    for name, snippet in STARTUP_SNIPPETS.items():
+        result = measure_startup(snippet, repeats)
+        print(f"{name:<45} {result['seconds']:>8.2f} {result['max_rss_mb']:>13.1f}")
+
+def load_test_questions(data_path: str) -> List[str]:
+    """Rebuild the held-out split train_model.main evaluates on and return its questions."""
+    from train_model import SPLIT_SEED, create_dataset, load_data
+
+    data, _ = load_data(data_path)
+    test_split = create_dataset(data).train_test_split(test_size=0.2, seed=SPLIT_SEED)["test"]
+    return [" ".join(tokens) for tokens in test_split["tokens"]]
+
+def check_parity(questions: List[str], backends: List[str], batch_size: int) -> int:
+    from ner_model import predict_card_spans
+
+    reference, *candidates = backends
+    mismatches = 0
+    for i in range(0, len(questions), batch_size):
+        batch = questions[i:i + batch_size]
+        expected = predict_card_spans(batch, backend=reference)
+        for backend in candidates:
+            for question, expected_spans, spans in zip(batch, expected, predict_card_spans(batch, backend=backend)):
+                if spans != expected_spans:
+                    mismatches += 1
+                    print(f"Mismatch ({reference} vs {backend}) in {question!r}: {expected_spans} != {spans}")
+    print(f"Entity span parity: {len(questions) - mismatches}/{len(questions)} questions identical")
+    return mismatches
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def measure_backend(questions: List[str], backend: str, batch_size: int) -> dict:
+    from ner_model import predict_card_spans, warm_up
+
+    warm_up(backend)
+
+    latencies = []
+    for question in questions:
+        start = time.perf_counter()
+        predict_card_spans([question], backend=backend)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(0, len(questions), batch_size):
+        predict_card_spans(questions[i:i + batch_size], backend=backend)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "throughput_qps": len(questions) / elapsed,
+    }
+
+def run_backend_benchmark(data_path: str, backends: List[str], batch_size: int):
+    questions = load_test_questions(data_path)
+    print(f"Benchmarking {len(questions)} test questions")
+    if len(backends) > 1:
+        check_parity(questions, backends, batch_size)
+
+    print(f"{'backend':<10} {'p50 (ms)':>9} {'p99 (ms)':>9} {f'batch {batch_size} q/s':>14}")
+    for backend in backends:
+        result = measure_backend(questions, backend, batch_size)
+        print(f"{backend:<10} {result['p50_ms']:>9.1f} {result['p99_ms']:>9.1f} {result['throughput_qps']:>14.1f}")
+
+def measure_concurrency(questions: List[str], predict_one: Callable, concurrency: int) -> dict:
+    latencies = []
+
+    def timed(question):
+        start = time.perf_counter()
+        predict_one(question)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(timed, questions))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "throughput_qps": len(questions) / elapsed,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+def measure_async_concurrency(questions: List[str], apredict_one: Callable, concurrency: int) -> dict:
+    """Like measure_concurrency, but with concurrency coroutines on one event loop instead of threads."""
+    latencies = []
+
+    async def run():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def timed(question):
+            async with semaphore:
+                start = time.perf_counter()
+                await apredict_one(question)
+                latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(timed(question) for question in questions))
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    elapsed = time.perf_counter() - start
+
+    return {
+        "throughput_qps": len(questions) / elapsed,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+def run_batching_benchmark(data_path: str, backend: str, concurrency_levels: List[int],
+                           max_batch_size: int, max_wait_ms: float):
+    from ner_batcher import NERBatcher
+    from ner_model import predict_card_spans, warm_up
+
+    questions = load_test_questions(data_path)
+    warm_up(backend)
+    batcher = NERBatcher(max_batch_size=max_batch_size, max_wait_ms=max_wait_ms, backend=backend)
+    # Threaded callers block on the batcher; asyncio callers await it from one event loop
+    modes = {
+        "unbatched": (measure_concurrency, lambda question: predict_card_spans([question], backend=backend)),
+        "batched": (measure_concurrency, batcher.predict),
+        "async": (measure_async_concurrency, batcher.apredict),
+    }
+
+    print(f"Benchmarking {len(questions)} test questions on {backend} "
+          f"(max batch {max_batch_size}, max wait {max_wait_ms} ms)")
+    print(f"{'concurrency':>11} {'mode':<10} {'q/s':>8} {'p99 (ms)':>9}")
+    try:
+        for concurrency in concurrency_levels:
+            for mode, (measure, predict_one) in modes.items():
+                result = measure(questions, predict_one, concurrency)
+                print(f"{concurrency:>11} {mode:<10} {result['throughput_qps']:>8.1f} {result['p99_ms']:>9.1f}")
+    finally:
+        batcher.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the card name NER model.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    startup_parser = subparsers.add_parser("startup", help="Import time and RSS of main.py with and without loading the model")
+    startup_parser.add_argument("--repeats", type=int, default=3, help="Fresh interpreters per scenario (default: 3)")
+
+    backends_parser = subparsers.add_parser("backends", help="Span parity, per-query latency and throughput of the inference backends")
+    backends_parser.add_argument("--data", default="sanity_check_tagged_data.json", help="Tagged data the model was trained on (default: sanity_check_tagged_data.json)")
+    backends_parser.add_argument("--backends", nargs="+", default=["pytorch", "onnx"], help="Backends to compare; the first is the parity reference (default: pytorch onnx)")
+    backends_parser.add_argument("--batch-size", type=int, default=32, help="Batch size for the throughput run (default: 32)")
+
+    batching_parser = subparsers.add_parser("batching", help="Throughput and p99 latency with and without micro-batching under concurrent threaded and asyncio load")
+    batching_parser.add_argument("--data", default="sanity_check_tagged_data.json", help="Tagged data the model was trained on (default: sanity_check_tagged_data.json)")
+    batching_parser.add_argument("--backend", default="pytorch", help="Inference backend (default: pytorch)")
+    batching_parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64], help="Concurrent callers to test (default: 1 4 16 64)")
+    batching_parser.add_argument("--max-batch-size", type=int, default=32, help="Batcher max batch size (default: 32)")
+    batching_parser.add_argument("--max-wait-ms", type=float, default=5.0, help="Batcher collection window (default: 5)")
+
+    args = parser.parse_args()
+    if args.command == "startup":
+        run_startup_benchmark(args.repeats)
+    elif args.command == "backends":
+        run_backend_benchmark(args.data, args.backends, args.batch_size)
+    elif args.command == "batching":
+        run_batching_benchmark(args.data, args.backend, args.concurrency, args.max_batch_size, args.max_wait_ms)
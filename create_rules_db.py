@@ -1,7 +1,12 @@
+import re
 import sqlite3
 from rules_processor import process_rules
 import os
 
+# Sections whose numbered rules are each titled with a single keyword, e.g. "702.19. Trample"
+KEYWORD_SECTIONS = {"701": "keyword action", "702": "keyword ability"}
+KEYWORD_RULE_PATTERN = re.compile(r'^(70[12])\.\d+$')
+
 def delete_rules_table(conn):
     cursor = conn.cursor()
     cursor.execute('DROP TABLE IF EXISTS rules')
@@ -27,6 +32,38 @@ def insert_or_update_rule(conn, rule_number, content, parent_rule):
     ''', (rule_number, content, parent_rule))
     conn.commit()
 
+def create_keyword_rules_table(conn):
+    cursor = conn.cursor()
+    cursor.execute('DROP TABLE IF EXISTS keyword_rules')
+    cursor.execute('''
+    CREATE TABLE keyword_rules (
+        keyword TEXT PRIMARY KEY,
+        rule_number TEXT NOT NULL,
+        kind TEXT NOT NULL
+    )
+    ''')
+    conn.commit()
+
+def build_keyword_rule_index(conn):
+    """Map every keyword ability (702.x) and keyword action (701.x) to its rule, from the rules already in the table."""
+    create_keyword_rules_table(conn)
+    cursor = conn.cursor()
+    cursor.execute("SELECT rule_number, content FROM rules WHERE rule_number LIKE '701.%' OR rule_number LIKE '702.%'")
+
+    entries = []
+    for rule_number, content in cursor.fetchall():
+        section = KEYWORD_RULE_PATTERN.match(rule_number)
+        title = content.strip().split('\n')[0].rstrip('.')
+        # Keyword rules are titled with just the keyword; skip the general rules (701.1, 702.1, ...)
+        if not section or len(title) > 40 or '. ' in title:
+            continue
+        for keyword in title.split(' and '):
+            entries.append((keyword.strip().lower(), rule_number, KEYWORD_SECTIONS[section.group(1)]))
+
+    cursor.executemany('INSERT OR IGNORE INTO keyword_rules (keyword, rule_number, kind) VALUES (?, ?, ?)', entries)
+    conn.commit()
+    return len(entries)
+
 def create_rules_db(rules_file_path, db_path):
     # Delete the existing database file if it exists
     if os.path.exists(db_path):
@@ -46,6 +83,9 @@ def create_rules_db(rules_file_path, db_path):
     rules = process_rules(rules_file_path)
     for rule in rules:
         insert_or_update_rule(conn, rule['rule_number'], rule['content'], rule['parent_rule'])
+
+    keyword_count = build_keyword_rule_index(conn)
+    print(f"Indexed {keyword_count} keywords to their rules")
     
     conn.close()
     print("Rules database created and populated successfully.")
@@ -1,6 +1,7 @@
 from typing import List, Dict, Any
 import logging
 from card_processor import process_cards_and_rulings
+from ability_processor import process_abilities
 from my_agent.api.mtg_cards_api import setup_card_database, insert_card_into_db, insert_ruling_into_db
 
 logger = logging.getLogger(__name__)
@@ -23,6 +24,9 @@ def process_cards_for_database(cards_file_path: str, rulings_file_path: str, dat
                         'comment': ruling
                     })
         
+        # Parse oracle text into structured abilities once here instead of on every question
+        process_abilities(database_path)
+
         logger.info(f"Processed {len(combined_data)} cards and their rulings for database")
     except Exception as e:
         logger.error(f"Error processing cards and rulings for database: {e}")
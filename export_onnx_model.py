@@ -0,0 +1,54 @@
+import argparse
+import logging
+import os
+
+import torch
+from transformers import AutoModelForTokenClassification, PreTrainedTokenizerFast
+
+from ner_model import MODEL_PATH, TOKENIZER_PATH, ONNX_MODEL_PATH
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def export_to_onnx(model_path: str, tokenizer_path: str, onnx_path: str, opset: int = 17):
+    model = AutoModelForTokenClassification.from_pretrained(model_path)
+    model.eval()
+    tokenizer = PreTrainedTokenizerFast.from_pretrained(tokenizer_path)
+
+    sample = tokenizer(["Does Pithing Needle stop planeswalker abilities?"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["logits"] = {0: "batch", 1: "sequence"}
+
+    # no_grad, not inference_mode: tracing can't use inference tensors on every torch/exporter version
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            onnx_path,
+            input_names=input_names,
+            output_names=["logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            do_constant_folding=True,
+        )
+    logger.info(f"Exported ONNX model to {onnx_path} ({os.path.getsize(onnx_path) / 1e6:.1f} MB)")
+
+def quantize_onnx_model(onnx_path: str, quantized_path: str):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    # Dynamic quantization: int8 weights, activations quantized per batch at runtime
+    quantize_dynamic(onnx_path, quantized_path, weight_type=QuantType.QInt8)
+    logger.info(f"Quantized ONNX model saved to {quantized_path} ({os.path.getsize(quantized_path) / 1e6:.1f} MB)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the card name NER model to ONNX with int8 dynamic quantization.")
+    parser.add_argument("--model-path", default=MODEL_PATH, help=f"Trained model directory (default: {MODEL_PATH})")
+    parser.add_argument("--tokenizer-path", default=TOKENIZER_PATH, help=f"Tokenizer directory (default: {TOKENIZER_PATH})")
+    parser.add_argument("--output", default=ONNX_MODEL_PATH, help=f"Quantized model path (default: {ONNX_MODEL_PATH})")
+    parser.add_argument("--opset", type=int, default=17, help="ONNX opset version (default: 17)")
+    args = parser.parse_args()
+
+    fp32_path = args.output.replace(".int8.onnx", ".onnx") if args.output.endswith(".int8.onnx") else args.output + ".fp32.onnx"
+    export_to_onnx(args.model_path, args.tokenizer_path, fp32_path, args.opset)
+    quantize_onnx_model(fp32_path, args.output)
@@ -1,8 +1,11 @@
 import os
+import asyncio
+import contextvars
 import logging
+import threading
+import time
 from typing import List, Optional, TypedDict, Union, Sequence, Annotated
 import json
-from transformers import AutoModelForTokenClassification, PreTrainedTokenizerFast
 from langchain.agents import AgentExecutor, OpenAIFunctionsAgent
 from langchain.prompts import ChatPromptTemplate, HumanMessagePromptTemplate, MessagesPlaceholder
 from langchain.schema import SystemMessage
@@ -10,12 +13,16 @@ from langchain.tools import Tool, StructuredTool
 from langchain_openai import ChatOpenAI
 from pydantic import BaseModel, Field
 
-from my_agent.api.mtg_cards_api import fetch_card_by_name
 from data_processor import process_cards_for_database, prepare_cards_for_vector_store
 from embeddings import initialize_embeddings
 from vector_store import create_vector_store, load_vector_store
 from config import load_api_key
 from my_agent.api.rules_api import get_rule_and_children
+from my_agent.api.async_db import run_db
+from my_agent.utils.prompt_cache import prompt_cache_metrics, prompt_tag
+from my_agent.utils.cascade import cascade_model_names
+from my_agent.utils.budget import MAX_SECONDS, MAX_STEPS, MAX_TOKENS, STEPS, TIME, TOKENS, TokenCounter, budget_metrics
+from my_agent.utils.tools import create_prefetched_card_messages, format_card_lookup, recognize_cards
 from app.api.chat.tools.game_state_constructor import GameStateConstructor
 
 logging.basicConfig(level=logging.INFO)
@@ -35,19 +42,15 @@ class GraphState(TypedDict):
 
 def create_card_name_recognition_tool():
     def recognize_card_names(card_names):
-        recognized_cards = []
-        for card_name in card_names:
-            card_details = fetch_card_by_name(database_path, card_name)
-            if card_details:
-                recognized_cards.extend(card_details)
-            else:
-                logger.warning(f"Card not found: {card_name}")
-        
-        logger.info(f"Recognized cards: {[card['name'] for card in recognized_cards]}")
-        return json.dumps(recognized_cards, indent=2)
+        recognized_cards = recognize_cards(card_names, database_path)
+        return format_card_lookup(recognized_cards)
+
+    async def arecognize_card_names(card_names):
+        return await run_db(recognize_card_names, card_names)
 
     return StructuredTool.from_function(
         func=recognize_card_names,
+        coroutine=arecognize_card_names,
         name="recognize_card_names",
         description="Recognize and log Magic: The Gathering card names from the user's input. Log everything that could conceivably be a card name. This includes card names you do not know. Your criteria for deciding whether to include it is that it is used in the sentence in a way that a Magic the Gathering card name might be. Your goal is to retrieve a unique list of card names used in the user's question so we can look up more information about those card names.",
         args_schema=CardNameRecognitionInput
@@ -81,11 +84,33 @@ def rules_lookup(rule_numbers: List[str]) -> str:
     print(f"Rules lookup full response:\n{full_response}")  # Debug print
     return full_response
 
-# Load the trained model and tokenizer
-model_path = "models/mtg_card_name_model"
-tokenizer_path = "models/tokenizer"
-model = AutoModelForTokenClassification.from_pretrained(model_path)
-tokenizer = PreTrainedTokenizerFast.from_pretrained(tokenizer_path)
+async def arules_lookup(rule_numbers: List[str]) -> str:
+    return await run_db(rules_lookup, rule_numbers)
+
+def create_rules_lookup_tool():
+    return StructuredTool.from_function(
+        func=rules_lookup,
+        coroutine=arules_lookup,
+        name="rules_lookup",
+        description="Look up multiple Magic: The Gathering rules by their numbers",
+        args_schema=RulesLookupInput
+    )
+
+def create_agent_tools(game_state_constructor: GameStateConstructor = None):
+    """Agent tools; each has an async implementation so the agent can also run under an event loop."""
+    game_state_constructor = game_state_constructor or GameStateConstructor()
+    return [
+        create_card_name_recognition_tool(),
+        create_rules_lookup_tool(),
+        Tool(
+            name="game_state_constructor",
+            func=game_state_constructor.run,
+            coroutine=game_state_constructor.arun,
+            description=game_state_constructor.description
+        )
+    ]
+
+# The trained card name model is loaded lazily and shared; see ner_model.get_ner_model and ner_model.warm_up
 
 def create_or_load_sqlite_db(database_path: str, cards_file_path: str, rulings_file_path: str):
     if not os.path.exists(database_path):
@@ -113,6 +138,63 @@ def print_search_results(results):
             print(f"{i}. Content: {result.page_content}")
         print()
 
+# Token usage and the budget that stopped the run, for the request the current executor run belongs to
+_request_usage = contextvars.ContextVar("request_usage", default=None)
+
+class BudgetedAgentExecutor(AgentExecutor):
+    """
+    AgentExecutor with a token ceiling on top of max_iterations and max_execution_time.
+
+    When any of them runs out, the loop stops and the agent answers from the
+    steps taken so far (early_stopping_method="generate"). Every run is recorded
+    in budget_metrics with the budget it exhausted, if any.
+    """
+    max_tokens: Optional[int] = MAX_TOKENS
+
+    def _should_continue(self, iterations: int, time_elapsed: float) -> bool:
+        usage = _request_usage.get()
+        exhausted = None
+        if self.max_iterations is not None and iterations >= self.max_iterations:
+            exhausted = STEPS
+        elif self.max_execution_time is not None and time_elapsed >= self.max_execution_time:
+            exhausted = TIME
+        elif self.max_tokens is not None and usage and usage["counter"].tokens >= self.max_tokens:
+            exhausted = TOKENS
+        if usage is not None:
+            usage["exhausted"] = exhausted
+        return exhausted is None
+
+    def _start_budget(self, run_manager):
+        usage = {"counter": TokenCounter(), "exhausted": None, "started_at": time.time()}
+        if run_manager is not None:
+            # Inherited by every model call the run makes
+            run_manager.inheritable_handlers.append(usage["counter"])
+        return usage, _request_usage.set(usage)
+
+    def _finish_budget(self, usage, token):
+        _request_usage.reset(token)
+        exhausted = usage["exhausted"]
+        # The async loop stops on a timeout without asking _should_continue
+        if exhausted is None and self.max_execution_time is not None and time.time() - usage["started_at"] >= self.max_execution_time:
+            exhausted = TIME
+        if exhausted:
+            logger.warning(f"Agent ran out of its {exhausted} budget and answered with what it had gathered")
+        budget_metrics.record(exhausted)
+
+    def _call(self, inputs, run_manager=None):
+        usage, token = self._start_budget(run_manager)
+        try:
+            return super()._call(inputs, run_manager)
+        finally:
+            self._finish_budget(usage, token)
+
+    async def _acall(self, inputs, run_manager=None):
+        usage, token = self._start_budget(run_manager)
+        try:
+            return await super()._acall(inputs, run_manager)
+        finally:
+            self._finish_budget(usage, token)
+
 def create_react_agent(llm, tools):
     prompt = ChatPromptTemplate.from_messages([
         SystemMessage(content="""
@@ -351,6 +433,7 @@ At the beginning of combat on your turn, another target creature you control gai
 Remember, you are a judge, so defer to the rules to make the decision. The person asking the question is only a player and may have given you bad information based on their flawed understanding. Use the rules and tools you have to answer the question.
 """),
         HumanMessagePromptTemplate.from_template("{input}"),
+        MessagesPlaceholder(variable_name="prefetched_cards", optional=True),
         MessagesPlaceholder(variable_name="agent_scratchpad"),
     ])
     
@@ -360,57 +443,77 @@ Remember, you are a judge, so defer to the rules to make the decision. The perso
         prompt=prompt
     )
     
-    return AgentExecutor(
+    return BudgetedAgentExecutor(
         agent=agent, 
         tools=tools, 
         verbose=True,
-        return_intermediate_steps=True
+        return_intermediate_steps=True,
+        max_iterations=MAX_STEPS,
+        max_execution_time=MAX_SECONDS,
+        max_tokens=MAX_TOKENS,
+        early_stopping_method="generate"
     )
 
+class AgentRuntime:
+    """
+    The model client, tools, prompt and agent executor, built once per process.
+
+    None of them keep per-request state (inputs travel through invoke), so one
+    runtime serves concurrent requests, and every request reuses the same HTTP
+    connection pool instead of opening its own.
+    """
+
+    def __init__(self, model_name: str = None):
+        # The executor drives a single model; MODEL_CASCADE_JUDGE picks it
+        model_name = model_name or cascade_model_names("judge")[-1]
+        # max_execution_time is only checked between steps; the timeout stops a single stuck call
+        self.llm = ChatOpenAI(temperature=0, model=model_name, stream_usage=True, callbacks=[prompt_cache_metrics],
+                              tags=[prompt_tag("judge")], timeout=MAX_SECONDS)
+        # A shallow copy shares the HTTP client; the constructor tags its own calls and takes its
+        # models from MODEL_CASCADE_GAME_STATE, not the judge's
+        self.game_state_constructor = GameStateConstructor(
+            model=self.llm.model_copy(update={"model_name": cascade_model_names("game_state")[-1], "tags": None})
+        )
+        self.card_name_tool = create_card_name_recognition_tool()
+        self.rules_lookup_tool = create_rules_lookup_tool()
+        self.tools = create_agent_tools(self.game_state_constructor)
+        # The judge prompt is static and the question and cards follow it, so its prefix is cacheable as is
+        self.agent_executor = create_react_agent(self.llm, self.tools)
+
+_agent_runtime = None
+_agent_runtime_lock = threading.Lock()
+
+def get_agent_runtime() -> AgentRuntime:
+    """Return the process-wide agent runtime, building it on first use."""
+    global _agent_runtime
+    if _agent_runtime is None:
+        with _agent_runtime_lock:
+            if _agent_runtime is None:
+                _agent_runtime = AgentRuntime()
+    return _agent_runtime
+
 def card_name_recognition(state: GraphState) -> GraphState:
-    card_name_tool = create_card_name_recognition_tool()
-    result = card_name_tool.run(state["question"])
+    result = get_agent_runtime().card_name_tool.run(state["question"])
     state["card_names"] = json.loads(result)
     return state
 
 def rules_lookup_node(state: GraphState) -> GraphState:
-    rules_lookup_tool = StructuredTool.from_function(
-        func=rules_lookup,
-        name="rules_lookup",
-        description="Look up multiple Magic: The Gathering rules by their numbers",
-        args_schema=RulesLookupInput
-    )
     # For simplicity, let's assume we're looking up rule 100
-    result = rules_lookup_tool.run(["100"])
+    result = get_agent_runtime().rules_lookup_tool.run({"rule_numbers": ["100"]})
     state["rules"] = result
     return state
 
 def game_state_construction(state: GraphState) -> GraphState:
-    game_state_constructor = GameStateConstructor()
-    result = game_state_constructor.run(state["question"])
+    result = get_agent_runtime().game_state_constructor.run(state["question"])
     state["game_state"] = result
     return state
 
 def agent_execution(state: GraphState) -> Union[GraphState, Sequence[Annotated[GraphState, "final_answer"]]]:
-    llm = ChatOpenAI(temperature=0, model="gpt-4o")
-    tools = [
-        create_card_name_recognition_tool(),
-        StructuredTool.from_function(
-            func=rules_lookup,
-            name="rules_lookup",
-            description="Look up multiple Magic: The Gathering rules by their numbers",
-            args_schema=RulesLookupInput
-        ),
-        Tool(
-            name="game_state_constructor",
-            func=GameStateConstructor().run,
-            description=GameStateConstructor().description
-        )
-    ]
-    agent_executor = create_react_agent(llm, tools)
-    
+    agent_executor = get_agent_runtime().agent_executor
+
     result = agent_executor.invoke({
         "input": state["question"],
+        "prefetched_cards": create_prefetched_card_messages(state["question"], database_path),
         "card_names": state["card_names"],
         "rules": state["rules"],
         "game_state": state["game_state"]
@@ -419,6 +522,37 @@ def agent_execution(state: GraphState) -> Union[GraphState, Sequence[Annotated[G
     state["response"] = result["output"]
     return [state]
 
+async def aagent_execution(state: GraphState) -> Union[GraphState, Sequence[Annotated[GraphState, "final_answer"]]]:
+    agent_executor = get_agent_runtime().agent_executor
+
+    result = await agent_executor.ainvoke({
+        "input": state["question"],
+        "prefetched_cards": await run_db(create_prefetched_card_messages, state["question"], database_path),
+        "card_names": state["card_names"],
+        "rules": state["rules"],
+        "game_state": state["game_state"]
+    })
+
+    state["response"] = result["output"]
+    return [state]
+
+async def stream_agent_answer(agent_executor, inputs: dict) -> str:
+    """Print tool calls and answer tokens as the agent produces them, and return the full answer."""
+    answer = ""
+    async for event in agent_executor.astream_events(inputs, version="v2"):
+        kind = event["event"]
+        if kind == "on_chat_model_stream":
+            token = event["data"]["chunk"].content
+            if token:
+                answer += token
+                print(token, end="", flush=True)
+        elif kind == "on_tool_start":
+            print(f"\n[{event['name']}] {event['data'].get('input')}", flush=True)
+        elif kind == "on_tool_end":
+            print(f"[{event['name']}] done", flush=True)
+    print()
+    return answer
+
 def main():
     cards_file_path = 'data/oracle-cards-20241105220317.json'
     rulings_file_path = 'data/rulings-20241105220032.json'
@@ -447,23 +581,8 @@ def main():
         [cards_file_path, rulings_file_path]
     )
 
-    # Create agent with tools
-    llm = ChatOpenAI(temperature=0, model="gpt-4o")
-    tools = [
-        create_card_name_recognition_tool(),
-        StructuredTool.from_function(
-            func=rules_lookup,
-            name="rules_lookup",
-            description="Look up multiple Magic: The Gathering rules by their numbers",
-            args_schema=RulesLookupInput
-        ),
-        Tool(
-            name="game_state_constructor",
-            func=GameStateConstructor().run,
-            description=GameStateConstructor().description
-        )
-    ]
-    agent_executor = create_react_agent(llm, tools)
+    # Build the agent once; every query below reuses it
+    agent_executor = get_agent_runtime().agent_executor
 
     # Example queries
     example_queries = [
@@ -473,8 +592,11 @@ def main():
 
     for query in example_queries:
         print(f"\n{'='*50}\nProcessing query: {query}\n{'='*50}")
-        result = agent_executor.invoke({"input": query})
-        print(f"Agent response: {result['output']}")
+        print("Agent response: ", end="")
+        asyncio.run(stream_agent_answer(agent_executor, {
+            "input": query,
+            "prefetched_cards": create_prefetched_card_messages(query, database_path)
+        }))
 
 if __name__ == "__main__":
     main()
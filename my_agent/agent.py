@@ -1,36 +1,121 @@
-from typing import TypedDict, Literal, Annotated
+import json
+import operator
+import os
+from typing import AsyncIterator, Iterator, TypedDict, Literal, Annotated
 from langgraph.graph import StateGraph, END
-from langchain_core.messages import AnyMessage
-from my_agent.utils.state import GraphState
-from my_agent.utils.nodes import call_model, call_tool, card_name_recognition, rules_lookup_node, agent_execution
+from langchain_core.runnables import RunnableLambda
+from langchain_core.messages import AIMessageChunk, AnyMessage, HumanMessage, ToolMessage
+from my_agent.utils.state import GraphState, merge_dicts
+from my_agent.utils.answer_cache import ANSWER_CACHE_ENABLED, get_answer_cache, normalize_question
+from my_agent.utils.tools import extract_bracketed_card_names, recognize_cards
+from my_agent.api.async_db import run_db
+from my_agent.api.single_flight import question_flights
+from my_agent.utils.nodes import (call_model, acall_model, call_tool, acall_tool, spot_cards, fetch_cards, afetch_cards,
+                                  prefetch_keyword_rules, aprefetch_keyword_rules, prefetch_glossary, aprefetch_glossary,
+                                  construct_game_state, aconstruct_game_state, assemble_context, manage_context,
+                                  route_question, aroute_question, quick_answer, aquick_answer, wrap_up, awrap_up,
+                                  budget_exhausted, is_rules_term, find_card_name)
+from my_agent.utils.router import CARD_TEXT, DEFINITION, INTERACTION, classify_question
 from langgraph.graph import MessagesState
 from langgraph.graph.message import add_messages
 
 # Define the config
 class GraphConfig(TypedDict):
     model_name: Literal["anthropic", "openai"]
+    parallel_tool_calls: bool
+    context_ledger: bool
+    context_token_budget: int
+    routing: bool
+    max_steps: int
+    max_tokens: int
+    max_seconds: float
 
 # Define the config
 class State(TypedDict):
     messages: Annotated[list[AnyMessage], add_messages]
     question: str
     card_names: list
+    cards: list
+    keyword_rules: dict
+    glossary: str
+    game_state: str
+    # INTERACTION questions go to the agent; definitions and card text are answered on the quick path
+    route: str
+    route_subject: str
+    # Rules and cards already in the conversation, mapped to the tool call that carried them
+    context_ledger: Annotated[dict, merge_dicts]
+    # Tool results for this thread, keyed by tool name and arguments
+    tool_cache: Annotated[dict, merge_dicts]
+    # Prompt tokens of each model turn
+    prompt_tokens: Annotated[list, operator.add]
+    # Of those, the tokens the provider served from its prompt prefix cache
+    cached_tokens: Annotated[list, operator.add]
+    # Budgets: tokens used by agent turns, when the question started, and which budget ran out if one did
+    total_tokens: Annotated[int, operator.add]
+    started_at: float
+    budget_exhausted: str
 
-def create_graph():
-    workflow = StateGraph(State)
-    workflow.add_node("agent", call_model)
-    workflow.add_node("action", call_tool)
-    workflow.set_entry_point("agent")
+# Game state construction costs an extra model call, so it is opt-in
+PREFETCH_GAME_STATE = os.environ.get("PREFETCH_GAME_STATE", "").lower() in ("1", "true", "yes")
 
-    # workflow.add_node("card_name_recognition", card_name_recognition)
-    # workflow.add_node("rules_lookup", rules_lookup_node)
-    # workflow.add_node("game_state_construction", game_state_construction)
-    # workflow.add_node("agent_execution", agent_execution)
+def add_retrieval_nodes(workflow, prefetch_game_state: bool):
+    """
+    Deterministic retrieval ahead of the first model call.
 
-    def should_continue(state):
+    spot_cards and route_question fan out to fetch_cards (then prefetch_keyword_rules),
+    prefetch_glossary and optionally construct_game_state. The branches run
+    concurrently, and assemble_context waits for all of them before handing over
+    to the agent, or to quick_answer for questions that are plain lookups.
+    """
+    workflow.add_node("spot_cards", spot_cards)
+    workflow.add_node("route_question", RunnableLambda(route_question, afunc=aroute_question))
+    workflow.add_node("quick_answer", RunnableLambda(quick_answer, afunc=aquick_answer))
+    workflow.add_node("fetch_cards", RunnableLambda(fetch_cards, afunc=afetch_cards))
+    workflow.add_node("prefetch_keyword_rules", RunnableLambda(prefetch_keyword_rules, afunc=aprefetch_keyword_rules))
+    workflow.add_node("prefetch_glossary", RunnableLambda(prefetch_glossary, afunc=aprefetch_glossary))
+    workflow.add_node("assemble_context", assemble_context)
+    workflow.set_entry_point("spot_cards")
+
+    workflow.add_edge("spot_cards", "route_question")
+    workflow.add_edge("route_question", "fetch_cards")
+    workflow.add_edge("fetch_cards", "prefetch_keyword_rules")
+    workflow.add_edge("route_question", "prefetch_glossary")
+    branch_ends = ["prefetch_keyword_rules", "prefetch_glossary"]
+    if prefetch_game_state:
+        workflow.add_node("construct_game_state", RunnableLambda(construct_game_state, afunc=aconstruct_game_state))
+        workflow.add_edge("route_question", "construct_game_state")
+        branch_ends.append("construct_game_state")
+    workflow.add_edge(branch_ends, "assemble_context")
+    workflow.add_conditional_edges(
+        "assemble_context",
+        lambda state: "agent" if state.get("route", INTERACTION) == INTERACTION else "quick_answer",
+        {"agent": "agent", "quick_answer": "quick_answer"}
+    )
+    workflow.add_edge("quick_answer", END)
+
+def create_graph(retrieval: bool = True, prefetch_game_state: bool = PREFETCH_GAME_STATE):
+    """
+    Build the agent graph. Every node that does I/O has an async counterpart, so
+    graph.ainvoke keeps model calls and lookups off the event loop and many
+    questions can run concurrently in one process.
+    """
+    workflow = StateGraph(State, config_schema=GraphConfig)
+    workflow.add_node("agent", RunnableLambda(call_model, afunc=acall_model))
+    workflow.add_node("action", RunnableLambda(call_tool, afunc=acall_tool))
+    workflow.add_node("manage_context", manage_context)
+    workflow.add_node("wrap_up", RunnableLambda(wrap_up, afunc=awrap_up))
+    if retrieval:
+        add_retrieval_nodes(workflow, prefetch_game_state)
+    else:
+        workflow.set_entry_point("agent")
+
+    def should_continue(state, config):
         last_message = state["messages"][-1]
-        if "function_call" not in last_message.additional_kwargs:
+        if not getattr(last_message, "tool_calls", None):
             return "end"
+        # Out of steps, tokens or time: answer with what has been gathered instead of looking up more
+        if budget_exhausted(state, config):
+            return "wrap_up"
         return "action"
 
     workflow.add_conditional_edges(
@@ -38,12 +123,152 @@ def create_graph():
         should_continue,
         {
             "action": "action",
+            "wrap_up": "wrap_up",
             "end": END
         }
     )
-    workflow.add_edge("action", "agent")
+    workflow.add_edge("wrap_up", END)
+    workflow.add_edge("action", "manage_context")
+    workflow.add_edge("manage_context", "agent")
     return workflow.compile()
 
 # Export the graph instance that langgraph will use
 graph = create_graph()
 
+# Nodes whose model output is the answer
+ANSWER_NODES = ("agent", "quick_answer", "wrap_up")
+
+# Stream modes used for answers: "messages" carries model tokens, "updates" carries node results
+STREAM_MODES = ["messages", "updates"]
+
+def answer_events(mode, chunk) -> Iterator[dict]:
+    """
+    Translate one graph stream item into answer events:
+    {"type": "step", "node"} when a retrieval node finishes,
+    {"type": "tool_call", "name", "args"} and {"type": "tool_result", "name", "content"} around tools,
+    {"type": "token", "content"} for each piece of the answer and {"type": "answer", "content"} at the end.
+    An answer written after a budget ran out carries "budget_exhausted" with the budget's name.
+    """
+    if mode == "messages":
+        message, metadata = chunk
+        # Only the answering nodes' output; models called inside other nodes (game state) stream too
+        if metadata.get("langgraph_node") in ANSWER_NODES and isinstance(message, AIMessageChunk) and message.content:
+            yield {"type": "token", "content": message.content}
+        return
+
+    for node, update in chunk.items():
+        if node == "quick_answer":
+            yield {"type": "answer", "content": update["messages"][-1].content}
+        elif node == "wrap_up":
+            yield {"type": "answer", "content": update["messages"][-1].content, "budget_exhausted": update["budget_exhausted"]}
+        elif node == "agent":
+            response = update["messages"][-1]
+            if response.tool_calls:
+                for tool_call in response.tool_calls:
+                    yield {"type": "tool_call", "name": tool_call["name"], "args": tool_call["args"]}
+            else:
+                yield {"type": "answer", "content": response.content}
+        elif node == "action":
+            for message in update["messages"]:
+                if isinstance(message, ToolMessage):
+                    yield {"type": "tool_result", "name": message.name, "content": message.content}
+        else:
+            yield {"type": "step", "node": node}
+
+def resolve_subjects(question: str) -> list:
+    """
+    What a question is about, part of its answer cache key: the subjects of
+    its [[cards]] and, for a lookup, the card or rules term the router resolved
+    (see router.classify_question).
+    """
+    card_names = extract_bracketed_card_names(question)
+    route, subject = classify_question(question, card_names, is_rules_term, find_card_name)
+    if route == CARD_TEXT and not card_names:
+        card_names = [subject]
+    subjects = [card["oracle_id"] for card in recognize_cards(card_names)] if card_names else []
+    if route == DEFINITION:
+        subjects.append(f"term:{subject.lower()}")
+    return subjects
+
+def cached_answer(question: str):
+    """(cached answer or None, subjects) for a question."""
+    subjects = resolve_subjects(question)
+    return get_answer_cache().lookup(question, subjects), subjects
+
+def use_answer_cache(bypass_cache: bool) -> bool:
+    return ANSWER_CACHE_ENABLED and not bypass_cache
+
+def cacheable(answer_event: dict) -> bool:
+    # A best-effort answer from a run that ran out of budget must not be served to later askers
+    return answer_event["type"] == "answer" and not answer_event.get("budget_exhausted")
+
+def question_key(question: str, config: dict, compiled_graph, bypass_cache: bool) -> tuple:
+    """Questions asked at the same time share one run when this matches; callbacks in config don't count."""
+    configurable = (config or {}).get("configurable") or {}
+    return (normalize_question(question), json.dumps(configurable, sort_keys=True, default=str),
+            id(compiled_graph or graph), bypass_cache)
+
+def answer_question(question: str, config: dict = None, compiled_graph=None, bypass_cache: bool = False) -> str:
+    """
+    The final answer to a question, served from the answer cache when an equivalent question was already answered.
+    Concurrent calls for the same question share one run (see single_flight).
+    """
+    return question_flights.do(question_key(question, config, compiled_graph, bypass_cache),
+                               _answer_question, question, config, compiled_graph, bypass_cache)
+
+def _answer_question(question: str, config: dict = None, compiled_graph=None, bypass_cache: bool = False) -> str:
+    if use_answer_cache(bypass_cache):
+        answer, subjects = cached_answer(question)
+        if answer is not None:
+            return answer
+    result = (compiled_graph or graph).invoke({"messages": [HumanMessage(content=question)]}, config)
+    answer = result["messages"][-1].content
+    if use_answer_cache(bypass_cache) and not result.get("budget_exhausted"):
+        get_answer_cache().store(question, subjects, answer)
+    return answer
+
+async def aanswer_question(question: str, config: dict = None, compiled_graph=None, bypass_cache: bool = False) -> str:
+    return await question_flights.ado(question_key(question, config, compiled_graph, bypass_cache),
+                                      _aanswer_question, question, config, compiled_graph, bypass_cache)
+
+async def _aanswer_question(question: str, config: dict = None, compiled_graph=None, bypass_cache: bool = False) -> str:
+    if use_answer_cache(bypass_cache):
+        answer, subjects = await run_db(cached_answer, question)
+        if answer is not None:
+            return answer
+    result = await (compiled_graph or graph).ainvoke({"messages": [HumanMessage(content=question)]}, config)
+    answer = result["messages"][-1].content
+    if use_answer_cache(bypass_cache) and not result.get("budget_exhausted"):
+        await run_db(get_answer_cache().store, question, subjects, answer)
+    return answer
+
+def stream_answer(question: str, config: dict = None, compiled_graph=None, bypass_cache: bool = False) -> Iterator[dict]:
+    """
+    Answer a question, yielding tool events and answer tokens as they arrive (see answer_events).
+    A cached answer comes back as a single {"type": "answer", "cached": True} event.
+    """
+    if use_answer_cache(bypass_cache):
+        answer, subjects = cached_answer(question)
+        if answer is not None:
+            yield {"type": "answer", "content": answer, "cached": True}
+            return
+    compiled_graph = compiled_graph or graph
+    for mode, chunk in compiled_graph.stream({"messages": [HumanMessage(content=question)]}, config, stream_mode=STREAM_MODES):
+        for event in answer_events(mode, chunk):
+            if cacheable(event) and use_answer_cache(bypass_cache):
+                get_answer_cache().store(question, subjects, event["content"])
+            yield event
+
+async def astream_answer(question: str, config: dict = None, compiled_graph=None, bypass_cache: bool = False) -> AsyncIterator[dict]:
+    if use_answer_cache(bypass_cache):
+        answer, subjects = await run_db(cached_answer, question)
+        if answer is not None:
+            yield {"type": "answer", "content": answer, "cached": True}
+            return
+    compiled_graph = compiled_graph or graph
+    async for mode, chunk in compiled_graph.astream({"messages": [HumanMessage(content=question)]}, config, stream_mode=STREAM_MODES):
+        for event in answer_events(mode, chunk):
+            if cacheable(event) and use_answer_cache(bypass_cache):
+                await run_db(get_answer_cache().store, question, subjects, event["content"])
+            yield event
+
@@ -1,6 +1,8 @@
 import sqlite3
 import json
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+
+from .single_flight import card_flights, coalesced
 
 def setup_card_database(database_path: str):
     conn = sqlite3.connect(database_path)
@@ -147,6 +149,7 @@ def fetch_all_card_names(database_path: str) -> List[str]:
 
     return card_names
 
+@coalesced(card_flights)
 def fetch_card_by_name(database_path: str, card_name: str) -> List[Dict[str, Any]]:
     """
     Fetch cards from the database that partially match the given name.
@@ -199,4 +202,123 @@ def fetch_card_by_name(database_path: str, card_name: str) -> List[Dict[str, Any
 
     conn.close()
 
-    return matching_cards
\ No newline at end of file
+    return matching_cards
+
+def _card_row_to_dict(card_result: sqlite3.Row, ruling_results: List[sqlite3.Row]) -> Dict[str, Any]:
+    card_dict = dict(card_result)
+
+    # Parse JSON strings back to Python objects
+    for key, value in card_dict.items():
+        if value and isinstance(value, str):
+            try:
+                card_dict[key] = json.loads(value)
+            except json.JSONDecodeError:
+                pass  # Keep the original string if it's not valid JSON
+
+    card_dict['rulings'] = [
+        {
+            'object': ruling['object'],
+            'source': ruling['source'],
+            'published_at': ruling['published_at'],
+            'comment': ruling['comment']
+        }
+        for ruling in ruling_results
+    ]
+
+    return card_dict
+
+ABILITY_FIELDS = ['kind', 'ability_word', 'keyword', 'keyword_parameter', 'trigger_condition', 'cost', 'effect']
+
+def fetch_card_abilities(cursor: sqlite3.Cursor, oracle_ids: List[str]) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+    """
+    Fetch the parsed abilities (see ability_processor) of several cards, keyed by oracle_id.
+
+    Only the fields that are set are included. Returns None for databases built
+    before the card_abilities table existed.
+    """
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'card_abilities'")
+    if cursor.fetchone() is None:
+        return None
+
+    abilities_by_oracle_id = {}
+    if oracle_ids:
+        placeholders = ", ".join("?" for _ in oracle_ids)
+        cursor.execute(
+            f"SELECT * FROM card_abilities WHERE oracle_id IN ({placeholders}) ORDER BY oracle_id, ability_index",
+            oracle_ids
+        )
+        for row in cursor.fetchall():
+            ability = {field: row[field] for field in ABILITY_FIELDS if row[field]}
+            targets = json.loads(row['targets']) if row['targets'] else []
+            if targets:
+                ability['targets'] = targets
+            abilities_by_oracle_id.setdefault(row['oracle_id'], []).append(ability)
+    return abilities_by_oracle_id
+
+# exact is part of the key: an exact and a partial lookup of the same names return different cards
+@coalesced(card_flights, key=lambda database_path, card_names, exact=False: (database_path, tuple(card_names), exact))
+def fetch_cards_by_names(database_path: str, card_names: List[str], exact: bool = False) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Fetch several cards in one batch, preferring exact (case-insensitive) name matches.
+
+    Names without an exact match fall back to the same partial match used by
+    fetch_card_by_name, unless exact is set. Everything runs over a single
+    connection and rulings are fetched with one query for all matched cards.
+
+    Args:
+        database_path (str): Path to the SQLite database.
+        card_names (List[str]): Names of the cards to search for.
+        exact (bool): Only return exact (case-insensitive) name matches.
+
+    Returns:
+        Dict[str, List[Dict[str, Any]]]: Matching cards keyed by the requested name.
+        Names that matched nothing map to an empty list.
+    """
+    results = {card_name: [] for card_name in card_names}
+    if not card_names:
+        return results
+
+    conn = sqlite3.connect(database_path)
+    conn.row_factory = sqlite3.Row
+    c = conn.cursor()
+
+    try:
+        placeholders = ", ".join("?" for _ in card_names)
+        c.execute(
+            f"SELECT * FROM cards WHERE lower(name) IN ({placeholders})",
+            [card_name.lower() for card_name in card_names]
+        )
+        rows_by_name = {}
+        for row in c.fetchall():
+            rows_by_name.setdefault(row['name'].lower(), []).append(row)
+
+        matched_rows = {}
+        for card_name in card_names:
+            rows = rows_by_name.get(card_name.lower())
+            if not rows and not exact:
+                c.execute("SELECT * FROM cards WHERE name LIKE ?", (f"%{card_name}%",))
+                rows = c.fetchall()
+            matched_rows[card_name] = rows or []
+
+        oracle_ids = list({row['oracle_id'] for rows in matched_rows.values() for row in rows})
+        rulings_by_oracle_id = {}
+        if oracle_ids:
+            placeholders = ", ".join("?" for _ in oracle_ids)
+            c.execute(f"SELECT * FROM rulings WHERE oracle_id IN ({placeholders})", oracle_ids)
+            for ruling in c.fetchall():
+                rulings_by_oracle_id.setdefault(ruling['oracle_id'], []).append(ruling)
+
+        abilities_by_oracle_id = fetch_card_abilities(c, oracle_ids)
+
+        for card_name, rows in matched_rows.items():
+            results[card_name] = [
+                _card_row_to_dict(row, rulings_by_oracle_id.get(row['oracle_id'], []))
+                for row in rows
+            ]
+            if abilities_by_oracle_id is not None:
+                for card in results[card_name]:
+                    card['abilities'] = abilities_by_oracle_id.get(card['oracle_id'], [])
+    finally:
+        conn.close()
+
+    return results
@@ -1,10 +1,20 @@
+import re
 import sqlite3
 import logging
+from typing import Dict, List, Tuple
+
+from .single_flight import coalesced, rule_flights
 
 # Add this at the top of the file
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+RULES_DB_PATH = 'db/mtg_rules.sqlite'
+
+# Rough token estimate so the agent doesn't need a tokenizer to stay within a budget
+CHARS_PER_TOKEN = 4
+
+@coalesced(rule_flights)
 def get_rule_and_children(rule_number):
     try:
         conn = sqlite3.connect('db/mtg_rules.sqlite')
@@ -48,6 +58,155 @@ def get_rule_and_children(rule_number):
         if conn:
             conn.close()
 
+def rule_sort_key(rule_number):
+    # "117.10" sorts after "117.9", and "117.1a" right after "117.1"
+    return [int(part) if part.isdigit() else part for part in re.findall(r'\d+|[a-z]', rule_number)]
+
+def get_rule_section(rule_number, db_path=RULES_DB_PATH) -> List[Tuple[str, str]]:
+    """
+    Fetch a rule and every rule nested under it, in rulebook order.
+
+    For a section like "603" this returns 603, 603.1, 603.1a, ... ; for a rule
+    like "117.3" it returns 117.3 and its lettered sub-rules.
+    """
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        cursor.execute(
+            'SELECT rule_number, content FROM rules WHERE rule_number = ? OR rule_number LIKE ? OR rule_number GLOB ?',
+            (rule_number, f"{rule_number}.%", f"{rule_number}[a-z]")
+        )
+        return sorted(cursor.fetchall(), key=lambda row: rule_sort_key(row[0]))
+    except sqlite3.Error as e:
+        logger.error(f"Database error: {e}")
+        return []
+    finally:
+        if conn:
+            conn.close()
+
+def format_rule_section(rows: List[Tuple[str, str]]) -> str:
+    """Render rules the way the Comprehensive Rules print them ("117.1. ..." and "117.1a ...")."""
+    return "\n".join(
+        f"{rule_number}. {content}" if rule_number[-1].isdigit() else f"{rule_number} {content}"
+        for rule_number, content in rows
+    )
+
+def normalize_keyword(keyword: str) -> str:
+    keyword = keyword.strip().lower()
+    # "Islandwalk", "Swampwalk", ... are all covered by the landwalk rule
+    if keyword.endswith("walk"):
+        return "landwalk"
+    return keyword
+
+def get_keyword_rule_numbers(keywords: List[str], db_path=RULES_DB_PATH) -> Dict[str, str]:
+    """
+    Look up the rule for each keyword in the keyword_rules index built by create_rules_db.
+
+    Variants such as "Partner with" fall back to their first word. Keywords with
+    no rule of their own (ability words like "Landfall") are left out.
+    """
+    candidates = {}
+    for keyword in keywords:
+        normalized = normalize_keyword(keyword)
+        candidates[keyword] = [normalized, normalized.split()[0]] if normalized else []
+    lookups = list({candidate for options in candidates.values() for candidate in options})
+    if not lookups:
+        return {}
+
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        placeholders = ", ".join("?" for _ in lookups)
+        rule_numbers = dict(conn.execute(
+            f'SELECT keyword, rule_number FROM keyword_rules WHERE keyword IN ({placeholders})', lookups
+        ).fetchall())
+    except sqlite3.Error as e:
+        logger.error(f"Database error: {e}")
+        return {}
+    finally:
+        if conn:
+            conn.close()
+
+    result = {}
+    for keyword, options in candidates.items():
+        for candidate in options:
+            if candidate in rule_numbers:
+                result[keyword] = rule_numbers[candidate]
+                break
+    return result
+
+def build_keyword_rules_excerpt(keywords: List[str], max_tokens: int = 1500, db_path=RULES_DB_PATH) -> Dict[str, object]:
+    """
+    Collect the rules for a set of keywords, each rule once, within a token budget.
+
+    Rules are added keyword by keyword in the order given; once the budget is
+    spent, the remaining sections are returned by number under "omitted" so they
+    can still be looked up.
+    """
+    budget = max_tokens * CHARS_PER_TOKEN
+    excerpts, omitted = [], []
+    included = set()
+    for rule_number in dict.fromkeys(get_keyword_rule_numbers(keywords, db_path).values()):
+        if rule_number in included:
+            continue
+        text = format_rule_section(get_rule_section(rule_number, db_path))
+        if len(text) > budget:
+            omitted.append(rule_number)
+            continue
+        excerpts.append(text)
+        included.add(rule_number)
+        budget -= len(text)
+    return {"rules": "\n\n".join(excerpts), "omitted": omitted}
+
+_glossary_terms = {}
+
+def get_glossary_terms(db_path=RULES_DB_PATH) -> List[str]:
+    """All glossary keywords, loaded once per database."""
+    if db_path not in _glossary_terms:
+        conn = None
+        try:
+            conn = sqlite3.connect(db_path)
+            _glossary_terms[db_path] = [row[0] for row in conn.execute('SELECT keyword FROM glossary').fetchall()]
+        except sqlite3.Error as e:
+            logger.error(f"Database error: {e}")
+            return []
+        finally:
+            if conn:
+                conn.close()
+    return _glossary_terms[db_path]
+
+def find_glossary_entries(text: str, max_terms: int = 5, db_path=RULES_DB_PATH) -> List[Tuple[str, str]]:
+    """
+    Glossary entries for the terms a question mentions, longest terms first.
+
+    Longer terms are more specific ("Triggered Ability" over "Ability"), so they
+    win when the number of entries is capped.
+    """
+    lowered = text.lower()
+    matches = [
+        term for term in get_glossary_terms(db_path)
+        if re.search(rf'\b{re.escape(term.lower())}\b', lowered)
+    ]
+    matches = sorted(matches, key=len, reverse=True)[:max_terms]
+    if not matches:
+        return []
+
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        placeholders = ", ".join("?" for _ in matches)
+        definitions = dict(conn.execute(
+            f'SELECT keyword, definition FROM glossary WHERE keyword IN ({placeholders})', matches
+        ).fetchall())
+    except sqlite3.Error as e:
+        logger.error(f"Database error: {e}")
+        return []
+    finally:
+        if conn:
+            conn.close()
+    return [(term, definitions[term]) for term in matches if term in definitions]
+
 # Add a function to check database connection and content
 def check_database():
     try:
@@ -0,0 +1,119 @@
+import asyncio
+import copy
+import functools
+import logging
+import os
+import threading
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+# Set SINGLE_FLIGHT=0 to run every call on its own
+SINGLE_FLIGHT_ENABLED = os.environ.get("SINGLE_FLIGHT", "1").lower() not in ("0", "false", "no")
+
+class SingleFlight:
+    """
+    Concurrent calls with the same key share one in-flight computation.
+
+    The first caller for a key runs it; callers that arrive while it is running
+    wait for its result (or exception) instead of repeating the work. Nothing is
+    kept once it finishes, so this only coalesces calls that overlap; it is not
+    a cache. Callers that joined get a deep copy of the result, so nobody can
+    mutate what another caller is holding.
+
+    do() is for threads and ado() for coroutines. Coroutines are only shared
+    within one event loop, and a caller that is cancelled doesn't cancel the
+    computation for the others waiting on it.
+    """
+
+    def __init__(self, name: str, enabled: bool = SINGLE_FLIGHT_ENABLED):
+        self.name = name
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._futures = {}
+        self._tasks = {}
+        self._calls = 0
+        self._shared = 0
+
+    def _record(self, shared: bool):
+        self._calls += 1
+        self._shared += shared
+        if shared:
+            logger.info(f"{self.name}: joined an in-flight call")
+
+    def do(self, key, func, *args, **kwargs):
+        if not self.enabled:
+            return func(*args, **kwargs)
+        with self._lock:
+            future = self._futures.get(key)
+            leader = future is None
+            if leader:
+                future = self._futures[key] = Future()
+            self._record(not leader)
+        if not leader:
+            return copy.deepcopy(future.result())
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._futures[key]
+
+    async def ado(self, key, func, *args, **kwargs):
+        if not self.enabled:
+            return await func(*args, **kwargs)
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+        with self._lock:
+            task = self._tasks.get(flight_key)
+            leader = task is None
+            if leader:
+                task = self._tasks[flight_key] = loop.create_task(func(*args, **kwargs))
+                task.add_done_callback(functools.partial(self._forget_task, flight_key))
+            self._record(not leader)
+        result = await asyncio.shield(task)
+        return result if leader else copy.deepcopy(result)
+
+    def _forget_task(self, flight_key, task):
+        with self._lock:
+            if self._tasks.get(flight_key) is task:
+                del self._tasks[flight_key]
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self._calls,
+                "shared": self._shared,
+                "shared_rate": round(self._shared / self._calls, 3) if self._calls else 0.0,
+            }
+
+    def reset(self):
+        with self._lock:
+            self._calls = 0
+            self._shared = 0
+
+# Shared by every caller in the process; read summary() for how many calls were coalesced
+question_flights = SingleFlight("questions")
+card_flights = SingleFlight("card lookups")
+rule_flights = SingleFlight("rule lookups")
+
+def coalesced(flight: SingleFlight, key=None):
+    """
+    Decorate a blocking function so concurrent calls with the same arguments share one run.
+
+    key(*args, **kwargs) builds the flight key; by default it is the arguments
+    themselves, which must then be hashable.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            flight_key = key(*args, **kwargs) if key else (args, tuple(sorted(kwargs.items())))
+            return flight.do((func.__name__, flight_key), func, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,213 @@
+import hashlib
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from typing import List, Optional
+
+from ..api.rules_api import RULES_DB_PATH
+from .tools import CARD_DB_PATH
+
+logger = logging.getLogger(__name__)
+
+ANSWER_CACHE_PATH = os.environ.get("ANSWER_CACHE_PATH", "db/answer_cache.sqlite")
+# Set ANSWER_CACHE=0 to answer every question with the agent
+ANSWER_CACHE_ENABLED = os.environ.get("ANSWER_CACHE", "1").lower() not in ("0", "false", "no")
+
+MAX_ENTRIES = 10000
+# Cosine similarity two questions about the same subjects need to share an answer
+SIMILARITY_THRESHOLD = 0.95
+# Pinned, so the similarity threshold means the same thing from one deployment to the next
+EMBEDDING_MODEL = os.environ.get("ANSWER_CACHE_EMBEDDING_MODEL", "text-embedding-3-small")
+
+def normalize_question(question: str) -> str:
+    """Lowercase, straighten apostrophes and drop punctuation and extra whitespace."""
+    question = question.replace('’', "'").lower()
+    return " ".join(re.sub(r"[^\w\s']", " ", question).split())
+
+def data_version(*paths: str) -> str:
+    """
+    Fingerprint of the databases answers were built from.
+
+    Rebuilding the rules or cards database changes its size or mtime, which
+    changes the version and so retires every answer cached against the old data.
+    """
+    parts = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            parts.append(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}")
+        except OSError:
+            parts.append(f"{os.path.basename(path)}:missing")
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()[:16]
+
+def cosine_similarity(a: array, b: array) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+@dataclass
+class CacheStats:
+    lookups: int = 0
+    exact_hits: int = 0
+    semantic_hits: int = 0
+    # A running total rather than every timing: the stats live as long as the process
+    lookup_seconds_total: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        return (self.exact_hits + self.semantic_hits) / self.lookups if self.lookups else 0.0
+
+    def summary(self) -> dict:
+        return {
+            "lookups": self.lookups,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.lookups - self.exact_hits - self.semantic_hits,
+            "hit_rate": round(self.hit_rate, 3),
+            "mean_lookup_ms": round(1000 * self.lookup_seconds_total / self.lookups, 3) if self.lookups else 0.0,
+        }
+
+class AnswerCache:
+    """
+    Final answers stored in SQLite on local disk, keyed by question, subjects and data version.
+
+    The subjects are what the question resolved to: the oracle_ids of its cards
+    and the rules term or card a lookup is about. A lookup first tries the exact
+    key: the normalized question, the sorted subjects and the data version.
+    Failing that, it compares the question's embedding against cached questions
+    with exactly the same subjects and data version, and reuses the closest
+    answer above the similarity threshold. Questions that resolved to no subject
+    are only served exact matches, as are all questions without an embeddings
+    model. The least recently used entries are evicted past max_entries.
+    """
+
+    def __init__(self, path: str = ANSWER_CACHE_PATH, embeddings=None, max_entries: int = MAX_ENTRIES,
+                 similarity_threshold: float = SIMILARITY_THRESHOLD,
+                 data_paths: tuple = (RULES_DB_PATH, CARD_DB_PATH), embedding_model: str = EMBEDDING_MODEL):
+        self.path = path
+        self.embeddings = embeddings
+        self.embedding_model = embedding_model
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.data_paths = data_paths
+        self.stats = CacheStats()
+        self._stats_lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with sqlite3.connect(self.path) as conn:
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS answers (
+                key TEXT PRIMARY KEY,
+                question TEXT NOT NULL,
+                card_key TEXT NOT NULL,
+                data_version TEXT NOT NULL,
+                embedding BLOB,
+                answer TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_answers_card_key ON answers(card_key, data_version)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_answers_last_used ON answers(last_used_at)')
+
+    def _key(self, question: str, card_key: str, version: str) -> str:
+        return hashlib.sha256(f"{normalize_question(question)}\x00{card_key}\x00{version}".encode()).hexdigest()
+
+    def _version(self) -> str:
+        # Embeddings from another model can't be compared, so changing it retires the cache like new data does
+        return data_version(*self.data_paths) + (f":{self.embedding_model}" if self.embeddings is not None else "")
+
+    def _embed(self, question: str) -> Optional[array]:
+        if self.embeddings is None:
+            return None
+        try:
+            return array('f', self.embeddings.embed_query(normalize_question(question)))
+        except Exception as e:
+            logger.warning(f"Could not embed question for the answer cache: {e}")
+            return None
+
+    def lookup(self, question: str, subjects: List[str]) -> Optional[str]:
+        """The cached answer for this question about these subjects, or None."""
+        start = time.perf_counter()
+        card_key = ",".join(sorted(set(subjects)))
+        version = self._version()
+        answer, kind = None, None
+        with sqlite3.connect(self.path) as conn:
+            key = self._key(question, card_key, version)
+            row = conn.execute('SELECT answer FROM answers WHERE key = ?', (key,)).fetchone()
+            if row:
+                answer, kind = row[0], "exact"
+            elif card_key:
+                candidates = conn.execute(
+                    'SELECT key, embedding, answer FROM answers WHERE card_key = ? AND data_version = ? AND embedding IS NOT NULL',
+                    (card_key, version)
+                ).fetchall()
+                embedding = self._embed(question) if candidates else None
+                if embedding is not None:
+                    best = max(
+                        ((cosine_similarity(embedding, array('f', blob)), candidate_key, candidate_answer)
+                         for candidate_key, blob, candidate_answer in candidates),
+                        default=None
+                    )
+                    if best and best[0] >= self.similarity_threshold:
+                        _, key, answer = best
+                        kind = "semantic"
+            if answer is not None:
+                conn.execute('UPDATE answers SET last_used_at = ?, hits = hits + 1 WHERE key = ?', (time.time(), key))
+
+        with self._stats_lock:
+            self.stats.lookups += 1
+            self.stats.lookup_seconds_total += time.perf_counter() - start
+            if kind == "exact":
+                self.stats.exact_hits += 1
+            elif kind == "semantic":
+                self.stats.semantic_hits += 1
+        if kind:
+            logger.info(f"Answer cache {kind} hit")
+        return answer
+
+    def store(self, question: str, subjects: List[str], answer: str):
+        card_key = ",".join(sorted(set(subjects)))
+        version = self._version()
+        embedding = self._embed(question)
+        now = time.time()
+        with sqlite3.connect(self.path) as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO answers (key, question, card_key, data_version, embedding, answer, created_at, last_used_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (self._key(question, card_key, version), question, card_key, version,
+                 embedding.tobytes() if embedding is not None else None, answer, now, now)
+            )
+            # Answers for older data can never be served again
+            conn.execute('DELETE FROM answers WHERE data_version != ?', (version,))
+            conn.execute(
+                'DELETE FROM answers WHERE key IN (SELECT key FROM answers ORDER BY last_used_at DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,)
+            )
+
+    def clear(self):
+        with sqlite3.connect(self.path) as conn:
+            conn.execute('DELETE FROM answers')
+
+_answer_cache = None
+_answer_cache_lock = threading.Lock()
+
+def get_answer_cache() -> AnswerCache:
+    """The process-wide answer cache, with OpenAI embeddings for near-duplicate matching when a key is configured."""
+    global _answer_cache
+    if _answer_cache is None:
+        with _answer_cache_lock:
+            if _answer_cache is None:
+                embeddings = None
+                if os.environ.get("OPENAI_API_KEY"):
+                    from langchain_openai import OpenAIEmbeddings
+                    embeddings = OpenAIEmbeddings(model=EMBEDDING_MODEL)
+                _answer_cache = AnswerCache(embeddings=embeddings)
+    return _answer_cache
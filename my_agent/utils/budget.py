@@ -0,0 +1,93 @@
+import os
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Per-request ceilings; override per request with the configurable keys of the same name in lower case
+MAX_STEPS = int(os.environ.get("AGENT_MAX_STEPS", "8"))
+MAX_TOKENS = int(os.environ.get("AGENT_MAX_TOKENS", "60000"))
+MAX_SECONDS = float(os.environ.get("AGENT_MAX_SECONDS", "90"))
+
+# Floor on one model call's timeout, so the best-effort answer still gets written once the deadline has passed
+MIN_CALL_SECONDS = float(os.environ.get("AGENT_MIN_CALL_SECONDS", "15"))
+
+STEPS, TOKENS, TIME = "steps", "tokens", "time"
+
+def request_budget(config) -> dict:
+    configurable = (config or {}).get("configurable") or {}
+    return {
+        "max_steps": configurable.get("max_steps", MAX_STEPS),
+        "max_tokens": configurable.get("max_tokens", MAX_TOKENS),
+        "max_seconds": configurable.get("max_seconds", MAX_SECONDS),
+    }
+
+def exhausted_budget(steps: int, tokens: int, started_at: Optional[float], config=None) -> Optional[str]:
+    """The first budget used up (STEPS, TOKENS or TIME), or None while there is room for another step."""
+    budget = request_budget(config)
+    if steps >= budget["max_steps"]:
+        return STEPS
+    if tokens >= budget["max_tokens"]:
+        return TOKENS
+    if started_at is not None and time.time() - started_at >= budget["max_seconds"]:
+        return TIME
+    return None
+
+def call_timeout(started_at: Optional[float], config=None) -> float:
+    """Seconds the next model call may take: what is left of the time budget, but at least MIN_CALL_SECONDS."""
+    max_seconds = request_budget(config)["max_seconds"]
+    remaining = max_seconds if started_at is None else started_at + max_seconds - time.time()
+    return max(remaining, MIN_CALL_SECONDS)
+
+def response_tokens(response) -> int:
+    """Total tokens of a response; for a model cascade's response, of every model it tried (see cascade.ModelCascade)."""
+    cascade_tokens = (getattr(response, "response_metadata", None) or {}).get("cascade_tokens")
+    if cascade_tokens:
+        return cascade_tokens
+    usage = getattr(response, "usage_metadata", None) or {}
+    return usage.get("total_tokens") or 0
+
+class BudgetMetrics:
+    """How many requests finished, and how many of them ran out of each budget."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def record(self, exhausted: Optional[str]):
+        with self._lock:
+            self._counts["requests"] += 1
+            if exhausted:
+                self._counts[exhausted] += 1
+
+    def summary(self) -> dict:
+        with self._lock:
+            requests = self._counts["requests"]
+            exhausted = {kind: self._counts[kind] for kind in (STEPS, TOKENS, TIME)}
+            return {
+                "requests": requests,
+                "exhausted": exhausted,
+                "exhausted_rate": round(sum(exhausted.values()) / requests, 3) if requests else 0.0,
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+budget_metrics = BudgetMetrics()
+
+class TokenCounter(BaseCallbackHandler):
+    """Total tokens of every model call made under the run it is attached to."""
+
+    def __init__(self):
+        self.tokens = 0
+
+    def on_llm_end(self, response, **kwargs):
+        messages = [getattr(generation, "message", None) for generations in response.generations for generation in generations]
+        if any(messages):
+            self.tokens += sum(response_tokens(message) for message in messages)
+        else:
+            # Completion models only report usage for the whole call
+            self.tokens += ((response.llm_output or {}).get("token_usage") or {}).get("total_tokens") or 0
@@ -0,0 +1,184 @@
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, List, Optional, Tuple
+
+from langchain_openai import ChatOpenAI
+from langgraph.constants import TAG_NOSTREAM
+
+from .budget import MAX_SECONDS, MIN_CALL_SECONDS, response_tokens
+from .prompt_cache import prompt_cache_metrics, prompt_tag
+
+logger = logging.getLogger(__name__)
+
+# Models tried in order for each node, smallest first. Override with e.g.
+# MODEL_CASCADE_AGENT="gpt-4o-mini,gpt-4o"; a single model disables the cascade for that node.
+DEFAULT_CASCADES = {
+    "agent": "gpt-4o-mini,gpt-4o",
+    "game_state": "gpt-4o-mini,gpt-4o",
+    "quick_answer": "gpt-4o-mini",
+    "judge": "gpt-4o",
+}
+
+# USD per million input and output tokens
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+
+# Mean token log probability below which a drafted answer is escalated
+MIN_MEAN_LOGPROB = -0.3
+
+HEDGING_PATTERN = re.compile(r"\b(i'?m not sure|not certain|i cannot determine|can't determine|unclear|it depends)\b", re.IGNORECASE)
+RULE_CITATION_PATTERN = re.compile(r'\b\d{3}\.\d+')
+
+def cascade_model_names(node: str) -> List[str]:
+    return [name.strip() for name in os.environ.get(f"MODEL_CASCADE_{node.upper()}", DEFAULT_CASCADES[node]).split(",") if name.strip()]
+
+def chat_model(name: str, tag: str, **kwargs) -> ChatOpenAI:
+    # A stuck request must not outlive the request budget; callers pass a tighter timeout per call
+    kwargs.setdefault("timeout", MAX_SECONDS)
+    return ChatOpenAI(model=name, temperature=0, stream_usage=True, callbacks=[prompt_cache_metrics],
+                      tags=[prompt_tag(tag)], **kwargs)
+
+def mean_logprob(response):
+    tokens = ((getattr(response, "response_metadata", None) or {}).get("logprobs") or {}).get("content") or []
+    return sum(token["logprob"] for token in tokens) / len(tokens) if tokens else None
+
+def answer_confidence(response) -> bool:
+    """
+    Whether a drafted agent turn can be kept.
+
+    Tool calls are kept: their results come back to the model, and the answer
+    they lead to is checked in turn. An answer must not hedge and, when the
+    provider returns log probabilities, must clear MIN_MEAN_LOGPROB. Citing a
+    rule stands in for the log probabilities when there are none; definitions
+    and card text rightly cite no rule, so a citation isn't required otherwise.
+    """
+    if getattr(response, "tool_calls", None):
+        return True
+    content = str(response.content)
+    if not content.strip() or HEDGING_PATTERN.search(content):
+        return False
+    logprob = mean_logprob(response)
+    if logprob is None:
+        return bool(RULE_CITATION_PATTERN.search(content))
+    return logprob >= MIN_MEAN_LOGPROB
+
+def has_content(response) -> bool:
+    """Acceptance for best-effort answers, which are told to say what they could not verify: any answer is kept."""
+    return bool(str(response.content).strip())
+
+def response_cost(model_name: str, response) -> float:
+    usage = getattr(response, "usage_metadata", None) or {}
+    input_price, output_price = MODEL_PRICES.get(model_name, (0.0, 0.0))
+    return ((usage.get("input_tokens") or 0) * input_price + (usage.get("output_tokens") or 0) * output_price) / 1_000_000
+
+class CascadeMetrics:
+    """Calls, escalations, latency and cost per cascade node and model."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._nodes = defaultdict(lambda: {"calls": 0, "escalations": 0})
+        self._models = defaultdict(lambda: {"calls": 0, "seconds": 0.0, "tokens": 0, "cost_usd": 0.0})
+
+    def record_call(self, node: str, model_name: str, seconds: float, tokens: int, cost: float):
+        with self._lock:
+            usage = self._models[(node, model_name)]
+            usage["calls"] += 1
+            usage["seconds"] += seconds
+            usage["tokens"] += tokens
+            usage["cost_usd"] += cost
+
+    def record_result(self, node: str, escalated: bool):
+        with self._lock:
+            self._nodes[node]["calls"] += 1
+            self._nodes[node]["escalations"] += escalated
+
+    def summary(self) -> dict:
+        with self._lock:
+            summary = {}
+            for node, totals in self._nodes.items():
+                models = {model_name: {**usage, "cost_usd": round(usage["cost_usd"], 6), "seconds": round(usage["seconds"], 3)}
+                          for (model_node, model_name), usage in self._models.items() if model_node == node}
+                summary[node] = {
+                    **totals,
+                    "escalation_rate": round(totals["escalations"] / totals["calls"], 3) if totals["calls"] else 0.0,
+                    "tokens": sum(usage["tokens"] for usage in models.values()),
+                    "cost_usd": round(sum(usage["cost_usd"] for usage in models.values()), 6),
+                    "models": models,
+                }
+            return summary
+
+    def reset(self):
+        with self._lock:
+            self._nodes.clear()
+            self._models.clear()
+
+cascade_metrics = CascadeMetrics()
+
+class ModelCascade:
+    """
+    Try each model in turn, smallest first, keeping the first response is_confident accepts.
+
+    The last model's response is always kept. Every model but the last is tagged
+    so LangGraph doesn't stream its tokens: a draft that gets escalated would
+    otherwise show up in the streamed answer. The kept response carries the
+    tokens of every model tried in response_metadata["cascade_tokens"], so the
+    drafts that were thrown away still count against the token budget.
+    """
+
+    def __init__(self, node: str, models: List[Tuple[str, object]], is_confident: Callable = answer_confidence,
+                 metrics: CascadeMetrics = cascade_metrics):
+        self.node = node
+        self.is_confident = is_confident
+        self.metrics = metrics
+        self.models = [
+            (name, model if i == len(models) - 1 else model.with_config(tags=[TAG_NOSTREAM]))
+            for i, (name, model) in enumerate(models)
+        ]
+
+    def _accept(self, i: int, name: str, response, start: float, tokens: int) -> bool:
+        self.metrics.record_call(self.node, name, time.perf_counter() - start, response_tokens(response), response_cost(name, response))
+        if i == len(self.models) - 1 or self.is_confident(response):
+            self.metrics.record_result(self.node, escalated=i > 0)
+            response.response_metadata["cascade_tokens"] = tokens
+            return True
+        logger.info(f"{self.node}: {name} not confident, escalating to {self.models[i + 1][0]}")
+        return False
+
+    def _call_kwargs(self, deadline: Optional[float]) -> dict:
+        # Every model gets what is left of the timeout, but at least MIN_CALL_SECONDS
+        return {} if deadline is None else {"timeout": max(deadline - time.perf_counter(), MIN_CALL_SECONDS)}
+
+    def invoke(self, messages, config=None, timeout: Optional[float] = None):
+        """timeout, in seconds, covers the whole cascade: an escalation gets what the smaller models left."""
+        deadline = time.perf_counter() + timeout if timeout is not None else None
+        tokens = 0
+        for i, (name, model) in enumerate(self.models):
+            start = time.perf_counter()
+            response = model.invoke(messages, config, **self._call_kwargs(deadline))
+            tokens += response_tokens(response)
+            if self._accept(i, name, response, start, tokens):
+                return response
+
+    async def ainvoke(self, messages, config=None, timeout: Optional[float] = None):
+        deadline = time.perf_counter() + timeout if timeout is not None else None
+        tokens = 0
+        for i, (name, model) in enumerate(self.models):
+            start = time.perf_counter()
+            response = await model.ainvoke(messages, config, **self._call_kwargs(deadline))
+            tokens += response_tokens(response)
+            if self._accept(i, name, response, start, tokens):
+                return response
+
+def build_cascade(node: str, is_confident: Callable = answer_confidence, bind=None, **model_kwargs) -> ModelCascade:
+    """A cascade over the node's configured models; bind(model) is applied to each, e.g. to bind tools."""
+    models = []
+    for name in cascade_model_names(node):
+        model = chat_model(name, node, **model_kwargs)
+        models.append((name, bind(model) if bind else model))
+    return ModelCascade(node, models, is_confident)
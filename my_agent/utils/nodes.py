@@ -1,60 +1,436 @@
-from langchain_openai import ChatOpenAI  # Changed from ChatAnthropic
 from langchain.prompts import ChatPromptTemplate
 from .state import GraphState
-from .tools import create_card_name_recognition_tool, create_rules_lookup_tool
+from .prompt_cache import cached_tokens
+from .cascade import build_cascade, has_content
+from .budget import budget_metrics, call_timeout, exhausted_budget, response_tokens
+from .router import CARD_TEXT, INTERACTION, classify_question
+from .tools import (create_card_name_recognition_tool, create_rules_lookup_tool, create_card_lookup_messages,
+                    collect_card_keywords, extract_bracketed_card_names, recognize_cards, KEYWORD_RULES_TOKEN_BUDGET)
+from ..api.rules_api import (CHARS_PER_TOKEN, build_keyword_rules_excerpt, find_glossary_entries, get_glossary_terms,
+                             get_keyword_rule_numbers)
+from ..api.async_db import run_db
+import asyncio
 import json
+import threading
+import time
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import Union, Sequence, Annotated
-from langgraph.prebuilt import ToolExecutor
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+logger = logging.getLogger(__name__)
+
 tool_belt = [
     create_card_name_recognition_tool(),
+    create_rules_lookup_tool(),
 ]
+tools_by_name = {tool.name: tool for tool in tool_belt}
 
-tool_executor = ToolExecutor(tool_belt)
+# Tool calls from one model turn run concurrently; the tools are I/O bound (SQLite lookups)
+MAX_TOOL_WORKERS = 8
+tool_pool = ThreadPoolExecutor(max_workers=MAX_TOOL_WORKERS, thread_name_prefix="tool")
 
-from langchain_core.utils.function_calling import convert_to_openai_function
+# Agent turns go to the small model first and escalate when its answer doesn't look confident
+# (see cascade.answer_confidence); card and rule lookups it asks for are kept as is.
+# parallel_tool_calls lets the model ask for every card and rule it needs in one turn.
+model = build_cascade("agent", bind=lambda chat: chat.bind_tools(tool_belt, parallel_tool_calls=True), logprobs=True)
+sequential_model = build_cascade("agent", bind=lambda chat: chat.bind_tools(tool_belt, parallel_tool_calls=False), logprobs=True)
+# Writes the best-effort answer when a question runs out of budget, so it has no tools. That answer is
+# meant to say what it could not verify, so answer_confidence would reject it every time; it isn't escalated
+answer_model = build_cascade("agent", is_confident=has_content)
+# Answers definition questions on the quick path, from the rules it is given
+cheap_model = build_cascade("quick_answer")
 
-functions = [convert_to_openai_function(t) for t in tool_belt]
-model = ChatOpenAI(
-    temperature=0,
-    model="gpt-4o"  # or gpt-3.5-turbo if preferred
-).bind_functions(functions)
+def estimate_tokens(messages) -> int:
+    chars = 0
+    for message in messages:
+        chars += len(str(message.content))
+        chars += sum(len(json.dumps(tool_call["args"])) for tool_call in getattr(message, "tool_calls", None) or [])
+    return chars // CHARS_PER_TOKEN
 
-def call_model(state):
+def prompt_tokens(response, messages) -> int:
+    """Prompt tokens the provider reports for a turn, or an estimate when it doesn't."""
+    usage = getattr(response, "usage_metadata", None) or {}
+    return usage.get("input_tokens") or estimate_tokens(messages)
+
+def call_model(state, config=None):
     messages = state.get("messages", [])
-    response = model.invoke(messages)
-    return {"messages": messages + [response]}
+    parallel = ((config or {}).get("configurable") or {}).get("parallel_tool_calls", True)
+    response = (model if parallel else sequential_model).invoke(messages, timeout=call_timeout(state.get("started_at"), config))
+    # add_messages appends; returning the whole history again only made it dedupe by id
+    return model_turn(state, messages, response)
 
-from langgraph.prebuilt import ToolInvocation
-import json
-from langchain_core.messages import FunctionMessage
+async def acall_model(state, config=None):
+    messages = state.get("messages", [])
+    parallel = ((config or {}).get("configurable") or {}).get("parallel_tool_calls", True)
+    response = await (model if parallel else sequential_model).ainvoke(messages, timeout=call_timeout(state.get("started_at"), config))
+    return model_turn(state, messages, response)
+
+def model_turn(state, messages, response) -> dict:
+    """State update for one agent turn, with its token usage for the budgets."""
+    if not response.tool_calls:
+        budget_metrics.record(None)
+    update = {
+        "messages": [response],
+        "prompt_tokens": [prompt_tokens(response, messages)],
+        "cached_tokens": [cached_tokens(response)],
+        "total_tokens": response_tokens(response) or estimate_tokens(messages + [response]),
+    }
+    if not state.get("started_at"):
+        update["started_at"] = time.time()
+    return update
+
+def budget_exhausted(state, config=None):
+    """Which budget, if any, stops the agent from taking another step (see budget.exhausted_budget)."""
+    return exhausted_budget(len(state.get("prompt_tokens") or []), state.get("total_tokens") or 0, state.get("started_at"), config)
+
+WRAP_UP_PROMPT = """The budget for this question has run out, so no more tools can be called. Answer now as well as you can from what has been gathered above, and say which parts you could not verify."""
+
+def wrap_up_messages(state):
+    # Every tool call needs a result before the model can be called again
+    skipped = [
+        ToolMessage(content="Not run: the budget for this question ran out.", name=tool_call["name"], tool_call_id=tool_call["id"])
+        for tool_call in state["messages"][-1].tool_calls
+    ]
+    return skipped, state["messages"] + skipped + [SystemMessage(content=WRAP_UP_PROMPT)]
+
+def wrap_up(state, config=None):
+    """Best-effort answer from what has been gathered, once a step, token or time budget is used up."""
+    exhausted = budget_exhausted(state, config)
+    logger.warning(f"Question ran out of its {exhausted} budget, answering with what was gathered")
+    skipped, messages = wrap_up_messages(state)
+    response = answer_model.invoke(messages, timeout=call_timeout(state.get("started_at"), config))
+    budget_metrics.record(exhausted)
+    return {"messages": skipped + [response], "budget_exhausted": exhausted}
+
+async def awrap_up(state, config=None):
+    exhausted = budget_exhausted(state, config)
+    logger.warning(f"Question ran out of its {exhausted} budget, answering with what was gathered")
+    skipped, messages = wrap_up_messages(state)
+    response = await answer_model.ainvoke(messages, timeout=call_timeout(state.get("started_at"), config))
+    budget_metrics.record(exhausted)
+    return {"messages": skipped + [response], "budget_exhausted": exhausted}
+
+def get_question(state):
+    if state.get("question"):
+        return state["question"]
+    for message in state.get("messages", []):
+        if isinstance(message, HumanMessage):
+            return message.content
+    return ""
+
+# Retrieval nodes: these run before the first model call so it already has the cards and rules it needs
+
+def spot_cards(state):
+    question = get_question(state)
+    # The time budget counts from here
+    return {"question": question, "card_names": extract_bracketed_card_names(question), "started_at": time.time()}
+
+def is_rules_term(subject: str) -> bool:
+    lowered = subject.lower()
+    return any(term.lower() == lowered for term in get_glossary_terms()) or bool(get_keyword_rule_numbers([subject]))
+
+def find_card_name(subject: str):
+    # Exact names only: a partial match would answer "what does blink do?" with Blink Dog's text
+    cards = recognize_cards([subject], exact=True)
+    return cards[0]["name"] if cards else None
+
+def route_question(state, config=None):
+    """Decide whether the question needs the agent or can be answered from the databases (see router.classify_question)."""
+    if not ((config or {}).get("configurable") or {}).get("routing", True):
+        return {"route": INTERACTION}
+    route, subject = classify_question(state["question"], state.get("card_names") or [], is_rules_term, find_card_name)
+    logger.info(f"Routed question to {route}" + (f" ({subject})" if subject else ""))
+    update = {"route": route, "route_subject": subject}
+    if route == CARD_TEXT and not state.get("card_names"):
+        update["card_names"] = [subject]
+    return update
+
+async def aroute_question(state, config=None):
+    return await run_db(route_question, state, config)
+
+def fetch_cards(state):
+    card_names = state.get("card_names") or []
+    return {"cards": recognize_cards(card_names) if card_names else []}
+
+async def afetch_cards(state):
+    card_names = state.get("card_names") or []
+    return {"cards": await run_db(recognize_cards, card_names) if card_names else []}
+
+def prefetch_keyword_rules(state):
+    keywords = collect_card_keywords(state.get("cards") or [])
+    return {"keyword_rules": build_keyword_rules_excerpt(keywords, KEYWORD_RULES_TOKEN_BUDGET)}
+
+async def aprefetch_keyword_rules(state):
+    keywords = collect_card_keywords(state.get("cards") or [])
+    return {"keyword_rules": await run_db(build_keyword_rules_excerpt, keywords, KEYWORD_RULES_TOKEN_BUDGET)}
+
+def format_glossary(entries):
+    return "\n\n".join(f"{term}\n{definition}" for term, definition in entries)
+
+def prefetch_glossary(state):
+    return {"glossary": format_glossary(find_glossary_entries(state["question"]))}
+
+async def aprefetch_glossary(state):
+    return {"glossary": format_glossary(await run_db(find_glossary_entries, state["question"]))}
+
+_game_state_constructor = None
+_game_state_constructor_lock = threading.Lock()
+
+def get_game_state_constructor():
+    """The process-wide game state constructor, built on first use and shared by every request."""
+    global _game_state_constructor
+    if _game_state_constructor is None:
+        with _game_state_constructor_lock:
+            if _game_state_constructor is None:
+                # Only available where the app package is deployed alongside my_agent
+                from app.api.chat.tools.game_state_constructor import GameStateConstructor
+                _game_state_constructor = GameStateConstructor()
+    return _game_state_constructor
+
+def construct_game_state(state):
+    # Lookups don't need a board
+    if state.get("route", INTERACTION) != INTERACTION:
+        return {}
+    return {"game_state": get_game_state_constructor().run(state["question"])}
+
+async def aconstruct_game_state(state):
+    if state.get("route", INTERACTION) != INTERACTION:
+        return {}
+    return {"game_state": await get_game_state_constructor().arun(state["question"])}
+
+def assemble_context(state):
+    """Merge the retrieval branches into the messages the agent starts from."""
+    messages = []
+    ledger = {}
+    if state.get("card_names"):
+        messages.extend(create_card_lookup_messages(state["card_names"], state.get("cards") or [], state.get("keyword_rules")))
+        tool_call_id = messages[0].tool_calls[0]["id"]
+        ledger = {ledger_key("recognize_card_names", card_name): tool_call_id for card_name in state["card_names"]}
+
+    reference = []
+    if state.get("glossary"):
+        reference.append(f"GLOSSARY:\n{state['glossary']}")
+    if state.get("game_state"):
+        reference.append(f"GAME STATE:\n{state['game_state']}")
+    if reference:
+        messages.append(SystemMessage(content="Reference material gathered for this question:\n\n" + "\n\n".join(reference)))
+    return {"messages": messages, "context_ledger": ledger}
+
+QUICK_ANSWER_PROMPT = """You are a Magic: The Gathering judge answering a short question about what a rules term or keyword means. Answer in a few sentences using only the reference text below, and cite the rule numbers you rely on."""
+
+def format_card_text(card: dict) -> str:
+    faces = card.get("card_faces") or [card]
+    lines = []
+    for face in faces:
+        lines.append(" ".join(part for part in [face.get("name"), face.get("mana_cost")] if part))
+        lines.extend(part for part in [face.get("type_line"), face.get("oracle_text")] if part)
+        if face.get("power") is not None:
+            lines.append(f"{face['power']}/{face.get('toughness')}")
+    rulings = card.get("rulings") or []
+    if rulings:
+        lines.append("Rulings:\n" + "\n".join(f"- {ruling['comment']}" for ruling in rulings))
+    return "\n".join(lines)
+
+def card_text_answer(state) -> AIMessage:
+    """The card's text and rulings straight from the database; no model call."""
+    cards = state.get("cards") or []
+    if not cards:
+        return AIMessage(content=f"I couldn't find a card named {state.get('route_subject')}.")
+    return AIMessage(content="\n\n".join(format_card_text(card) for card in cards))
+
+def definition_messages(state) -> list:
+    term = state.get("route_subject") or state["question"]
+    reference = [build_keyword_rules_excerpt([term], KEYWORD_RULES_TOKEN_BUDGET)["rules"], format_glossary(find_glossary_entries(term))]
+    return [
+        SystemMessage(content=QUICK_ANSWER_PROMPT),
+        SystemMessage(content="REFERENCE:\n" + "\n\n".join(part for part in reference if part)),
+        HumanMessage(content=state["question"])
+    ]
+
+def quick_answer(state):
+    """Answer a lookup without the agent: card text directly, definitions with one call to the cheap model."""
+    if state.get("route") == CARD_TEXT:
+        return {"messages": [card_text_answer(state)]}
+    return {"messages": [cheap_model.invoke(definition_messages(state))]}
+
+async def aquick_answer(state):
+    if state.get("route") == CARD_TEXT:
+        return {"messages": [card_text_answer(state)]}
+    return {"messages": [await cheap_model.ainvoke(await run_db(definition_messages, state))]}
+
+# Tools whose argument is a list of items (rules, cards) that can each already be in the conversation
+LEDGER_ITEMS = {"rules_lookup": ("rule_numbers", "Rule"), "recognize_card_names": ("card_names", "Card")}
+
+def ledger_key(tool_name: str, item: str) -> str:
+    return f"{tool_name}:{item.strip().lower()}"
+
+def tool_cache_key(tool_name: str, args: dict) -> str:
+    return f"{tool_name}:{json.dumps(args, sort_keys=True)}"
+
+def plan_tool_calls(tool_calls, ledger: dict):
+    """
+    Split each tool call into the items still to fetch and back-references to
+    items already in the conversation, per the context ledger.
+
+    Returns (tool call, arguments to run with or None, back-references) per call,
+    and the ledger entries the new items will add. An item asked for twice in the
+    same turn is fetched by the first call only.
+    """
+    ledger = dict(ledger or {})
+    added = {}
+    plans = []
+    for tool_call in tool_calls:
+        args, references = tool_call["args"], []
+        if tool_call["name"] in LEDGER_ITEMS and isinstance(args.get(LEDGER_ITEMS[tool_call["name"]][0]), list):
+            arg_name, label = LEDGER_ITEMS[tool_call["name"]]
+            new_items = []
+            for item in args[arg_name]:
+                key = ledger_key(tool_call["name"], item)
+                if key in ledger:
+                    references.append(f"{label} {item}: already provided above (tool call {ledger[key]}).")
+                else:
+                    ledger[key] = added[key] = tool_call["id"]
+                    new_items.append(item)
+            args = {**args, arg_name: new_items} if new_items else None
+        plans.append((tool_call, args, references))
+    return plans, added
+
+def tool_message(tool_call, content: str, references: list) -> ToolMessage:
+    content = "\n\n".join(([content] if content else []) + references)
+    return ToolMessage(content=content, name=tool_call["name"], tool_call_id=tool_call["id"])
+
+def run_tool_call(tool_call, args=None, tool_cache=None) -> ToolMessage:
+    tool = tools_by_name.get(tool_call["name"])
+    args = tool_call["args"] if args is None else args
+    tool_cache = {} if tool_cache is None else tool_cache
+    cache_key = tool_cache_key(tool_call["name"], args)
+    if cache_key in tool_cache:
+        return ToolMessage(content=tool_cache[cache_key], name=tool_call["name"], tool_call_id=tool_call["id"])
+    try:
+        if tool is None:
+            raise ValueError(f"Unknown tool: {tool_call['name']}")
+        content = str(tool.invoke(args))
+        tool_cache[cache_key] = content
+    except Exception as e:
+        # Report the failure to the model instead of failing the other calls in the batch
+        logger.error(f"Tool call {tool_call['name']} failed: {e}")
+        content = f"Error: {e}"
+    return ToolMessage(content=content, name=tool_call["name"], tool_call_id=tool_call["id"])
+
+async def arun_tool_call(tool_call, args=None, tool_cache=None) -> ToolMessage:
+    tool = tools_by_name.get(tool_call["name"])
+    args = tool_call["args"] if args is None else args
+    tool_cache = {} if tool_cache is None else tool_cache
+    cache_key = tool_cache_key(tool_call["name"], args)
+    if cache_key in tool_cache:
+        return ToolMessage(content=tool_cache[cache_key], name=tool_call["name"], tool_call_id=tool_call["id"])
+    try:
+        if tool is None:
+            raise ValueError(f"Unknown tool: {tool_call['name']}")
+        content = str(await tool.ainvoke(args))
+        tool_cache[cache_key] = content
+    except Exception as e:
+        logger.error(f"Tool call {tool_call['name']} failed: {e}")
+        content = f"Error: {e}"
+    return ToolMessage(content=content, name=tool_call["name"], tool_call_id=tool_call["id"])
+
+def placed_in_context(added: dict, messages: list) -> dict:
+    """Ledger entries for the calls that succeeded; a failed call may be retried in full."""
+    failed = {message.tool_call_id for message in messages if message.content.startswith("Error:")}
+    return {key: tool_call_id for key, tool_call_id in added.items() if tool_call_id not in failed}
+
+# Rough ceiling on the conversation sent to the model each turn
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "12000"))
+# How much of a trimmed tool result stays in the conversation
+TRIMMED_PREVIEW_CHARS = 300
+
+def trim_tool_message(message: ToolMessage) -> ToolMessage:
+    return ToolMessage(
+        id=message.id,
+        content=f"{message.content[:TRIMMED_PREVIEW_CHARS]}...\n[Trimmed to save context. Call {message.name} again for the full text.]",
+        name=message.name,
+        tool_call_id=message.tool_call_id,
+        additional_kwargs={"trimmed": True}
+    )
+
+def manage_context(state, config=None):
+    """
+    Keep the conversation under the token budget before the next model turn.
+
+    Old tool results are cut to a short preview, oldest first, until the estimate
+    fits. System messages, the question and the latest turn's results are never
+    touched, and a trimmed message keeps its place and id, so the conversation
+    prefix stays identical from turn to turn for provider prompt caching.
+    Trimmed rules and cards leave the context ledger so asking again returns
+    them in full (from the tool cache, without another lookup).
+    """
+    budget = ((config or {}).get("configurable") or {}).get("context_token_budget", CONTEXT_TOKEN_BUDGET)
+    messages = state.get("messages", [])
+    total = estimate_tokens(messages)
+    if total <= budget:
+        return {}
+
+    last_turn = max((i for i, message in enumerate(messages) if isinstance(message, AIMessage) and message.tool_calls), default=0)
+    trimmed = []
+    for message in messages[:last_turn]:
+        if total <= budget:
+            break
+        if (isinstance(message, ToolMessage) and not message.additional_kwargs.get("trimmed")
+                and len(message.content) > 2 * TRIMMED_PREVIEW_CHARS):
+            replacement = trim_tool_message(message)
+            total -= estimate_tokens([message]) - estimate_tokens([replacement])
+            trimmed.append(replacement)
+
+    trimmed_calls = {message.tool_call_id for message in trimmed}
+    ledger = {key: None for key, tool_call_id in (state.get("context_ledger") or {}).items() if tool_call_id in trimmed_calls}
+    logger.info(f"Trimmed {len(trimmed)} tool results, context now ~{total} tokens (budget {budget})")
+    return {"messages": trimmed, "context_ledger": ledger}
+
+def use_context_ledger(config) -> bool:
+    return ((config or {}).get("configurable") or {}).get("context_ledger", True)
+
+def call_tool(state, config=None):
+    """
+    Run every tool call of the last model turn concurrently, answering each with its own ToolMessage.
+
+    Rules and cards already in the conversation come back as a short
+    back-reference instead of their full text, and results are cached for the
+    rest of the thread in tool_cache.
+    """
+    tool_calls = state["messages"][-1].tool_calls
+    if not use_context_ledger(config):
+        return {"messages": list(tool_pool.map(run_tool_call, tool_calls))}
 
-def call_tool(state):
-  last_message = state["messages"][-1]
+    plans, added = plan_tool_calls(tool_calls, state.get("context_ledger"))
+    tool_cache = dict(state.get("tool_cache") or {})
 
-  action = ToolInvocation(
-      tool=last_message.additional_kwargs["function_call"]["name"],
-      tool_input=json.loads(
-          last_message.additional_kwargs["function_call"]["arguments"]
-      )
-  )
+    def run(plan):
+        tool_call, args, references = plan
+        if args is None:
+            return tool_message(tool_call, "", references)
+        return tool_message(tool_call, run_tool_call(tool_call, args, tool_cache).content, references)
 
-  response = tool_executor.invoke(action)
+    messages = list(tool_pool.map(run, plans))
+    return {"messages": messages, "context_ledger": placed_in_context(added, messages), "tool_cache": tool_cache}
 
-  function_message = FunctionMessage(content=str(response), name=action.tool)
+async def acall_tool(state, config=None):
+    tool_calls = state["messages"][-1].tool_calls
+    if not use_context_ledger(config):
+        return {"messages": list(await asyncio.gather(*(arun_tool_call(tool_call) for tool_call in tool_calls)))}
 
-  return {"messages" : [function_message]}
+    plans, added = plan_tool_calls(tool_calls, state.get("context_ledger"))
+    tool_cache = dict(state.get("tool_cache") or {})
 
-def card_name_recognition(state: GraphState) -> GraphState:
-    card_name_tool = create_card_name_recognition_tool()
-    result = card_name_tool.run({"card_names": [state["response"]]}, db_path="/deps/__outer_my_agent/my_agent/db/mtg_cards.sqlite")
-    state["card_names"] = json.loads(result)
-    return state
+    async def run(plan):
+        tool_call, args, references = plan
+        if args is None:
+            return tool_message(tool_call, "", references)
+        return tool_message(tool_call, (await arun_tool_call(tool_call, args, tool_cache)).content, references)
 
-def rules_lookup_node(state: GraphState) -> GraphState:
-    rules_lookup_tool = create_rules_lookup_tool()
-    result = rules_lookup_tool.run(["100"])
-    state["rules"] = result
-    return state
+    messages = list(await asyncio.gather(*(run(plan) for plan in plans)))
+    return {"messages": messages, "context_ledger": placed_in_context(added, messages), "tool_cache": tool_cache}
 
 # def game_state_construction(state: GraphState) -> GraphState:
 #     game_state_constructor = GameStateConstructor()
@@ -0,0 +1,64 @@
+import hashlib
+import logging
+import threading
+from collections import defaultdict
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+logger = logging.getLogger(__name__)
+
+# Models are tagged "prompt:<name>" so their usage is reported per prompt
+PROMPT_TAG_PREFIX = "prompt:"
+
+def prompt_tag(name: str) -> str:
+    return f"{PROMPT_TAG_PREFIX}{name}"
+
+def prefix_fingerprint(text: str) -> str:
+    """Short hash of a static prompt prefix; it must not change between requests for the provider cache to hit."""
+    return hashlib.sha256(text.encode()).hexdigest()[:12]
+
+def cached_tokens(message) -> int:
+    """Prompt tokens the provider served from its prefix cache for one response."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    return (usage.get("input_token_details") or {}).get("cache_read") or 0
+
+class PromptCacheMetrics(BaseCallbackHandler):
+    """
+    Input and cached input tokens reported by the provider, per prompt.
+
+    OpenAI caches prompt prefixes of 1024 tokens or more, so the hit rate
+    (cached / input tokens) shows whether the static part of each prompt is
+    being reused under load.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._usage = defaultdict(lambda: {"calls": 0, "input_tokens": 0, "cached_tokens": 0})
+
+    def on_llm_end(self, response, *, tags=None, **kwargs):
+        name = next((tag[len(PROMPT_TAG_PREFIX):] for tag in tags or [] if tag.startswith(PROMPT_TAG_PREFIX)), "untagged")
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None)
+                if not usage:
+                    continue
+                with self._lock:
+                    totals = self._usage[name]
+                    totals["calls"] += 1
+                    totals["input_tokens"] += usage.get("input_tokens") or 0
+                    totals["cached_tokens"] += cached_tokens(message)
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                name: {**totals, "hit_rate": round(totals["cached_tokens"] / totals["input_tokens"], 3) if totals["input_tokens"] else 0.0}
+                for name, totals in self._usage.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._usage.clear()
+
+# Shared by every model in the process; pass it in callbacks and read summary() for the metric
+prompt_cache_metrics = PromptCacheMetrics()
@@ -0,0 +1,65 @@
+import re
+from typing import Callable, List, Tuple
+
+# Questions that go to the full agent; the others are answered from the databases
+INTERACTION = "interaction"
+DEFINITION = "definition"
+CARD_TEXT = "card_text"
+
+# Longer questions describe a board or a sequence of plays, which only the agent can work through
+MAX_SIMPLE_QUESTION_WORDS = 20
+
+# Words that make a question about how things interact rather than what one thing is
+INTERACTION_CUES = re.compile(
+    r"\b(if|when|whenever|while|after|before|then|respond|response|stack|triggers?|triggered|resolves?|resolved|"
+    r"attacks?|attacking|blocks?|blocking|cop(?:y|ies)|counter(?:s|ed)?|targets?|targeting|damage|dies|sacrifice|"
+    r"combo|interact|with|against|can i|could i|would|still)\b",
+    re.IGNORECASE
+)
+
+# "what does ward do?", "what is trample?", "define scry", "how does convoke work?"
+DEFINITION_PATTERNS = [
+    re.compile(r"^what(?:'s| is| are| does)\s+(?:an?\s+|the\s+)?(?P<subject>[\w' ,-]+?)(?:\s+(?:do|does|mean|means))?$", re.IGNORECASE),
+    re.compile(r"^(?:define|explain)\s+(?:an?\s+|the\s+)?(?P<subject>[\w' ,-]+?)$", re.IGNORECASE),
+    re.compile(r"^how does\s+(?P<subject>[\w' ,-]+?)\s+work$", re.IGNORECASE),
+]
+
+# "what's the text of Pithing Needle?", "rulings for [[Rest in Peace]]", "what does Pithing Needle say?"
+CARD_TEXT_PATTERNS = [
+    re.compile(r"\b(?:text|oracle text|wording|rulings?)\s+(?:of|for|on)\s+(?P<subject>.+)$", re.IGNORECASE),
+    re.compile(r"^what does\s+(?P<subject>.+?)\s+(?:say|do)$", re.IGNORECASE),
+]
+
+def normalize_for_routing(question: str) -> str:
+    question = question.replace('’', "'").replace("[[", "").replace("]]", "")
+    return " ".join(question.split()).strip().rstrip("?.!").strip()
+
+def classify_question(question: str, card_names: List[str], is_term: Callable[[str], bool],
+                      find_card: Callable[[str], str]) -> Tuple[str, str]:
+    """
+    Route a question to (route, subject).
+
+    DEFINITION when it asks what a single rules term or keyword means (is_term
+    decides), CARD_TEXT when it asks for the text or rulings of a single card
+    (find_card returns its name for an exact, case-insensitive match, or None),
+    INTERACTION for everything else, including subjects that match no card exactly.
+    Anything long, multi-card or with interaction cues goes to the agent even
+    if it looks like a lookup.
+    """
+    text = normalize_for_routing(question)
+    if (len(card_names) > 1 or len(text.split()) > MAX_SIMPLE_QUESTION_WORDS
+            or re.search(r"[?.!]\s", text) or INTERACTION_CUES.search(text)):
+        return INTERACTION, ""
+
+    for pattern in DEFINITION_PATTERNS:
+        match = pattern.match(text)
+        if match and not card_names and is_term(match.group("subject")):
+            return DEFINITION, match.group("subject")
+
+    for pattern in CARD_TEXT_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            card_name = card_names[0] if card_names else find_card(match.group("subject"))
+            if card_name:
+                return CARD_TEXT, card_name
+    return INTERACTION, ""
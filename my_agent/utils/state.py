@@ -6,3 +6,8 @@ class GraphState(TypedDict):
     rules: Optional[str]
     game_state: Optional[str]
     response: Optional[str]
+
+def merge_dicts(left: Optional[dict], right: Optional[dict]) -> dict:
+    """Reducer for state fields that several nodes add entries to. A None value removes the key."""
+    merged = {**(left or {}), **(right or {})}
+    return {key: value for key, value in merged.items() if value is not None}
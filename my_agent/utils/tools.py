@@ -2,8 +2,12 @@ from langchain.tools import Tool, StructuredTool
 from pydantic import BaseModel, Field
 from typing import List
 import json
-from ..api.mtg_cards_api import fetch_card_by_name
-from ..api.rules_api import get_rule_and_children
+import re
+import uuid
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+from ..api.mtg_cards_api import fetch_cards_by_names
+from ..api.rules_api import build_keyword_rules_excerpt, get_rule_and_children
+from ..api.async_db import run_db
 import os
 
 class CardNameRecognitionInput(BaseModel):
@@ -30,36 +34,120 @@ print(f"Script location: {os.path.dirname(__file__)}")
 print(f"Project root: {PROJECT_ROOT}")
 print(f"DB path: {DB_PATH}")
 
+CARD_DB_PATH = "/deps/__outer_my_agent/my_agent/db/mtg_cards.sqlite"
+
+# Keyword rules sent back with recognized cards are capped at roughly this many tokens
+KEYWORD_RULES_TOKEN_BUDGET = 1500
+
+# Reddit-style card references, e.g. "[[Duke Ulder Ravenguard]]"
+BRACKETED_CARD_PATTERN = re.compile(r'\[\[([^\]]+)\]\]')
+
 import logging
 
 logger = logging.getLogger(__name__)
 
+def extract_bracketed_card_names(text: str) -> List[str]:
+    """Return the unique [[Card Name]] references in text, in order of appearance."""
+    text = text.replace('\u2019', "'")
+    card_names = []
+    for match in BRACKETED_CARD_PATTERN.findall(text):
+        card_name = match.strip()
+        if card_name and card_name not in card_names:
+            card_names.append(card_name)
+    return card_names
+
+def recognize_cards(card_names: List[str], db_path: str = CARD_DB_PATH, exact: bool = False) -> List[dict]:
+    """Resolve all card names with a single batch lookup; exact skips the partial-name fallback."""
+    recognized_cards = []
+    seen_oracle_ids = set()
+    for card_name, card_details in fetch_cards_by_names(db_path, card_names, exact).items():
+        if not card_details:
+            logger.warning(f"Card not found: {card_name}")
+        for card in card_details:
+            if card['oracle_id'] not in seen_oracle_ids:
+                seen_oracle_ids.add(card['oracle_id'])
+                recognized_cards.append(card)
+
+    logger.info(f"Recognized cards: {[card['name'] for card in recognized_cards]}")
+    return recognized_cards
+
+def collect_card_keywords(cards: List[dict]) -> List[str]:
+    """Unique keywords of the given cards, from Scryfall's keyword list and any parsed keyword abilities."""
+    keywords = []
+    for card in cards:
+        card_keywords = card.get('keywords') or []
+        card_keywords = card_keywords + [ability['keyword'] for ability in card.get('abilities') or [] if ability.get('keyword')]
+        for keyword in card_keywords:
+            if keyword.lower() not in (k.lower() for k in keywords):
+                keywords.append(keyword)
+    return keywords
+
+def format_card_lookup(recognized_cards: List[dict], keyword_rules: dict = None,
+                       max_rule_tokens: int = KEYWORD_RULES_TOKEN_BUDGET) -> str:
+    """
+    Serialize recognized cards for the model together with the rules for their keywords.
+
+    Attaching the keyword rules here saves the model a rules_lookup turn per keyword.
+    Rules that didn't fit the budget are listed by number so they can still be looked up.
+    Pass keyword_rules if they were already fetched.
+    """
+    result = {"cards": recognized_cards}
+    if keyword_rules is None:
+        keyword_rules = build_keyword_rules_excerpt(collect_card_keywords(recognized_cards), max_rule_tokens)
+    if keyword_rules["rules"]:
+        result["keyword_rules"] = keyword_rules["rules"]
+    if keyword_rules["omitted"]:
+        result["keyword_rules_not_included"] = keyword_rules["omitted"]
+    return json.dumps(result, indent=2)
+
+def create_prefetched_card_messages(question: str, db_path: str = CARD_DB_PATH) -> List[BaseMessage]:
+    """
+    Resolve the [[Card Name]] references in a question before the agent runs.
+
+    The result is shaped as an already completed recognize_card_names call so the
+    first model turn sees the card data without spending a turn requesting it.
+    Returns an empty list when the question has no bracketed card names.
+    """
+    card_names = extract_bracketed_card_names(question)
+    if not card_names:
+        return []
+
+    return create_card_lookup_messages(card_names, recognize_cards(card_names, db_path))
+
+def create_card_lookup_messages(card_names: List[str], recognized_cards: List[dict],
+                                keyword_rules: dict = None) -> List[BaseMessage]:
+    """An already completed recognize_card_names call carrying the given cards."""
+    tool_call_id = f"call_{uuid.uuid4().hex}"
+    return [
+        AIMessage(
+            content="",
+            tool_calls=[{"name": "recognize_card_names", "args": {"card_names": card_names}, "id": tool_call_id}],
+            id=str(uuid.uuid4())
+        ),
+        ToolMessage(content=format_card_lookup(recognized_cards, keyword_rules), name="recognize_card_names",
+                    tool_call_id=tool_call_id)
+    ]
+
 def create_card_name_recognition_tool():
-    def recognize_card_names(card_names, db_path="/deps/__outer_my_agent/my_agent/db/mtg_cards.sqlite"):
+    def recognize_card_names(card_names, db_path=CARD_DB_PATH):
         logger.info(f"Attempting to recognize cards: {card_names}")
         logger.info(f"Using database path: {db_path}")
         
         try:
-            recognized_cards = []
-            for card_name in card_names:
-                logger.info(f"Looking up card: {card_name}")
-                card_details = fetch_card_by_name(db_path, card_name)
-                if card_details:
-                    recognized_cards.extend(card_details)
-                    logger.info(f"Found card: {card_name}")
-                else:
-                    logger.warning(f"Card not found: {card_name}")
-            
-            logger.info(f"Recognized cards: {[card['name'] for card in recognized_cards]}")
-            return json.dumps(recognized_cards, indent=2)
+            recognized_cards = recognize_cards(card_names, db_path)
+            return format_card_lookup(recognized_cards)
         except Exception as e:
             logger.error(f"Error in recognize_card_names: {str(e)}")
             raise
 
+    async def arecognize_card_names(card_names, db_path=CARD_DB_PATH):
+        return await run_db(recognize_card_names, card_names, db_path)
+
     return StructuredTool.from_function(
         func=recognize_card_names,
+        coroutine=arecognize_card_names,
         name="recognize_card_names",
-        description="Pass this tool a list of Magic: The Gathering card names and it will return a list of card details including full text and rulings for the card's abilities. You should call this tool for each thing in user query that sounds like it could be a Magic: The Gathering card name or is being used in the query like a card name would be.",
+        description="Pass this tool a list of Magic: The Gathering card names and it will return a list of card details including full text and rulings for the card's abilities, plus the rules for the cards' keywords. You should call this tool for each thing in user query that sounds like it could be a Magic: The Gathering card name or is being used in the query like a card name would be.",
         args_schema=CardNameRecognitionInput
     )
 
@@ -87,8 +175,12 @@ def create_rules_lookup_tool():
         print(f"Rules lookup full response:\n{full_response}")
         return full_response
 
+    async def arules_lookup(rule_numbers: List[str]) -> str:
+        return await run_db(rules_lookup, rule_numbers)
+
     return StructuredTool.from_function(
         func=rules_lookup,
+        coroutine=arules_lookup,
         name="rules_lookup",
         description="Look up multiple Magic: The Gathering rules by their numbers",
         args_schema=RulesLookupInput
@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Tuple
+
+from ner_model import predict_card_spans, token_length
+
+logger = logging.getLogger(__name__)
+
+class NERBatcher:
+    """
+    Collects concurrent card name recognition requests into batched forward passes.
+
+    A background thread waits for the first request, keeps collecting until
+    max_batch_size requests are queued or max_wait_ms has passed, groups them
+    by tokenized length (bucket_width tokens per bucket) so short questions
+    aren't padded to the longest one, runs one forward pass per bucket and
+    resolves each caller's future. Every future is resolved, with an exception
+    if the model failed or returned no result for it.
+    """
+
+    def __init__(self, predict_fn: Callable = predict_card_spans, max_batch_size: int = 32,
+                 max_wait_ms: float = 5.0, bucket_width: int = 16, backend: str = None,
+                 length_fn: Callable = token_length):
+        self.predict_fn = predict_fn
+        self.length_fn = length_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.bucket_width = bucket_width
+        self.backend = backend
+        self._queue = queue.Queue()
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="ner-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, text: str) -> Future:
+        if self._closed:
+            raise RuntimeError("NERBatcher is closed")
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def predict(self, text: str, timeout: float = None) -> List[Tuple[int, int, str]]:
+        """Blocking call for threaded callers."""
+        return self.submit(text).result(timeout)
+
+    async def apredict(self, text: str) -> List[Tuple[int, int, str]]:
+        """Awaitable call for asyncio callers; the event loop is never blocked."""
+        return await asyncio.wrap_future(self.submit(text))
+
+    def close(self):
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join()
+
+    def _collect_batch(self, first) -> List:
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # let the main loop see the shutdown
+                break
+            batch.append(item)
+        return batch
+
+    def _bucket(self, batch: List) -> Dict[int, List]:
+        buckets = {}
+        for text, future in batch:
+            # Subword tokens, not words: the padding cost is in tokens and card names split into many
+            buckets.setdefault(self.length_fn(text, self.backend) // self.bucket_width, []).append((text, future))
+        return buckets
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch = self._collect_batch(first)
+            # Skip requests whose callers already gave up (e.g. a cancelled asyncio task)
+            batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            try:
+                buckets = list(self._bucket(batch).values())
+            except Exception as e:
+                logger.error(f"Could not tokenize {len(batch)} NER requests: {e}")
+                buckets = []
+                self._fail_unresolved(batch, e)
+            for bucket in buckets:
+                self._run_bucket(bucket)
+
+    def _run_bucket(self, bucket: List):
+        texts = [text for text, _ in bucket]
+        error = None
+        try:
+            results = self.predict_fn(texts, backend=self.backend)
+            for (_, future), spans in zip(bucket, results):
+                future.set_result(spans)
+        except Exception as e:
+            logger.error(f"Batched NER inference failed for {len(texts)} requests: {e}")
+            error = e
+        finally:
+            # Callers wait on their future, so one the model returned nothing for must still be resolved
+            self._fail_unresolved(bucket, error or RuntimeError("NER model returned no result for this request"))
+
+    @staticmethod
+    def _fail_unresolved(requests: List, error: Exception):
+        for _, future in requests:
+            if not future.done():
+                future.set_exception(error)
+
+_lock = threading.Lock()
+_batcher = None
+
+def get_ner_batcher() -> NERBatcher:
+    """Return the process-wide batcher, starting it on first use."""
+    global _batcher
+    if _batcher is None:
+        with _lock:
+            if _batcher is None:
+                _batcher = NERBatcher()
+    return _batcher
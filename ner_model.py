@@ -0,0 +1,169 @@
+import logging
+import os
+import threading
+import time
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+MODEL_PATH = "models/mtg_card_name_model"
+TOKENIZER_PATH = "models/tokenizer"
+ONNX_MODEL_PATH = "models/mtg_card_name_model.int8.onnx"
+
+# "pytorch" or "onnx"; the ONNX model is produced by export_onnx_model.py
+NER_BACKEND = os.getenv("NER_BACKEND", "pytorch")
+BACKENDS = ("pytorch", "onnx")
+
+# Must match the label order used by train_model.load_data
+NER_LABELS = ["O", "B-CARD", "I-CARD"]
+
+_lock = threading.Lock()
+_ner_model = None
+_onnx_session = None
+_tokenizer = None
+
+def _load_ner_model(model_path: str, tokenizer_path: str):
+    # Heavy imports stay here so importing this module costs nothing
+    import torch
+    from transformers import AutoModelForTokenClassification, PreTrainedTokenizerFast
+
+    start = time.perf_counter()
+    use_safetensors = os.path.exists(os.path.join(model_path, "model.safetensors"))
+    model = AutoModelForTokenClassification.from_pretrained(
+        model_path,
+        use_safetensors=use_safetensors or None
+    )
+    model.eval()
+    # Inference only: no autograd bookkeeping for the parameters
+    for parameter in model.parameters():
+        parameter.requires_grad_(False)
+    tokenizer = PreTrainedTokenizerFast.from_pretrained(tokenizer_path)
+
+    logger.info(f"Loaded NER model from {model_path} in {time.perf_counter() - start:.2f}s "
+                f"(safetensors: {use_safetensors}, torch threads: {torch.get_num_threads()})")
+    return model, tokenizer
+
+def _load_onnx_session(onnx_model_path: str):
+    import onnxruntime
+
+    start = time.perf_counter()
+    session_options = onnxruntime.SessionOptions()
+    session_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    session = onnxruntime.InferenceSession(onnx_model_path, session_options, providers=["CPUExecutionProvider"])
+    logger.info(f"Loaded ONNX NER model from {onnx_model_path} in {time.perf_counter() - start:.2f}s")
+    return session
+
+def get_ner_model():
+    """Return the process-wide (model, tokenizer) pair, loading it on first use."""
+    global _ner_model
+    if _ner_model is None:
+        with _lock:
+            if _ner_model is None:
+                _ner_model = _load_ner_model(MODEL_PATH, TOKENIZER_PATH)
+    return _ner_model
+
+def get_onnx_session():
+    """Return the process-wide (ONNX Runtime session, tokenizer) pair, loading it on first use."""
+    global _onnx_session, _tokenizer
+    if _onnx_session is None:
+        with _lock:
+            if _onnx_session is None:
+                from transformers import PreTrainedTokenizerFast
+
+                _tokenizer = PreTrainedTokenizerFast.from_pretrained(TOKENIZER_PATH)
+                _onnx_session = _load_onnx_session(ONNX_MODEL_PATH)
+    return _onnx_session, _tokenizer
+
+def get_tokenizer(backend: str = None):
+    """The tokenizer of the given backend's model, loading the model on first use."""
+    backend = backend or NER_BACKEND
+    return (get_onnx_session() if backend == "onnx" else get_ner_model())[1]
+
+def token_length(text: str, backend: str = None) -> int:
+    return len(get_tokenizer(backend)(text).input_ids)
+
+def warm_up(backend: str = None):
+    """
+    Load the model and run one forward pass.
+
+    Call this at startup (e.g. a gunicorn preload hook) so the first request
+    doesn't pay for loading the model and the first, slowest forward pass.
+    """
+    start = time.perf_counter()
+    predict_card_spans(["Does [[Pithing Needle]] stop Lightning Bolt?"], backend=backend)
+    logger.info(f"NER model warm-up finished in {time.perf_counter() - start:.2f}s")
+
+def decode_card_spans(text: str, offsets, label_ids) -> List[Tuple[int, int, str]]:
+    """Turn per-token label ids into (start, end, text) character spans of card names."""
+    spans = []
+    start = end = None
+    for (token_start, token_end), label_id in zip(offsets, label_ids):
+        token_start, token_end = int(token_start), int(token_end)
+        if token_start == token_end:
+            continue  # special and padding tokens
+        label = NER_LABELS[int(label_id)]
+        if label == "B-CARD" or (label == "I-CARD" and start is None):
+            if start is not None:
+                spans.append((start, end))
+            start, end = token_start, token_end
+        elif label == "I-CARD":
+            end = token_end
+        elif start is not None:
+            spans.append((start, end))
+            start = None
+    if start is not None:
+        spans.append((start, end))
+    return [(span_start, span_end, text[span_start:span_end]) for span_start, span_end in spans]
+
+def _predict_label_ids_pytorch(texts: List[str]):
+    import torch
+
+    model, tokenizer = get_ner_model()
+    encoded = tokenizer(texts, padding=True, truncation=True, return_offsets_mapping=True, return_tensors="pt")
+    offsets = encoded.pop("offset_mapping")
+    with torch.inference_mode():
+        logits = model(**encoded).logits
+    return offsets.tolist(), logits.argmax(dim=-1).tolist()
+
+def _predict_label_ids_onnx(texts: List[str]):
+    session, tokenizer = get_onnx_session()
+    encoded = tokenizer(texts, padding=True, truncation=True, return_offsets_mapping=True, return_tensors="np")
+    offsets = encoded.pop("offset_mapping")
+    input_names = {model_input.name for model_input in session.get_inputs()}
+    feed = {name: array.astype("int64") for name, array in encoded.items() if name in input_names}
+    logits = session.run(["logits"], feed)[0]
+    return offsets.tolist(), logits.argmax(axis=-1).tolist()
+
+def predict_card_spans(texts: List[str], backend: str = None) -> List[List[Tuple[int, int, str]]]:
+    """Run the NER model over a batch of texts and return the card name spans for each."""
+    backend = backend or NER_BACKEND
+    if backend == "onnx":
+        offsets, predictions = _predict_label_ids_onnx(texts)
+    elif backend == "pytorch":
+        offsets, predictions = _predict_label_ids_pytorch(texts)
+    else:
+        raise ValueError(f"Unknown NER backend: {backend}")
+
+    return [
+        decode_card_spans(text, offsets[i], predictions[i])
+        for i, text in enumerate(texts)
+    ]
+
+def extract_card_names(question: str, backend: str = None) -> List[str]:
+    """
+    Return the unique card names the NER model finds in a question.
+
+    With the default backend the question goes through the shared micro-batcher,
+    so concurrent callers share forward passes; an explicit backend runs directly.
+    """
+    if backend is None:
+        # ner_batcher imports this module
+        from ner_batcher import get_ner_batcher
+        spans = get_ner_batcher().predict(question)
+    else:
+        spans = predict_card_spans([question], backend=backend)[0]
+    card_names = []
+    for _, _, card_name in spans:
+        if card_name not in card_names:
+            card_names.append(card_name)
+    return card_names
@@ -1,56 +1,169 @@
-import pandas as pd
+import argparse
+import glob
 import json
-import uuid
+import logging
+import os
 import re
+import threading
+import time
+import uuid
+from multiprocessing import Pool
+
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SENTENCE_SPLIT_PATTERN = re.compile(r'(?<=[.!?])\s+')
+CARD_PART_PATTERN = re.compile(r'(\[\[[^\]]+\]\])')
+CARD_TOKEN_PATTERN = re.compile(r"[\w']+'s|\w+|[.,!?;]")
+OTHER_TOKEN_PATTERN = re.compile(r"\w+|[.,!?;]")
+
+SHARD_PATTERN = "shard-{:05d}.jsonl"
+MANIFEST_NAME = "manifest.json"
 
 def normalize_apostrophes(text):
     # Replace right single quotation mark (U+2019) with apostrophe
     return text.replace('\u2019', "'")
 
+def tokenize_sentence(sentence):
+    tokens = []
+    labels = []
+    for part in CARD_PART_PATTERN.split(sentence):
+        if part.startswith('[[') and part.endswith(']]'):
+            card_tokens = CARD_TOKEN_PATTERN.findall(part[2:-2])
+            for i, token in enumerate(card_tokens):
+                tokens.append(token)
+                labels.append('B-CARD' if i == 0 else 'I-CARD')
+        else:
+            other_tokens = OTHER_TOKEN_PATTERN.findall(part)
+            tokens.extend(other_tokens)
+            labels.extend(['O'] * len(other_tokens))
+    return tokens, labels
+
+def process_rows(rows):
+    """Turn (id, body) rows into tagged records for every sentence that references a card."""
+    result = []
+    for row_id, body in rows:
+        if not isinstance(body, str) or '[[' not in body:
+            continue
+        for sentence_index, sentence in enumerate(SENTENCE_SPLIT_PATTERN.split(normalize_apostrophes(body))):
+            if '[[' in sentence and ']]' in sentence:
+                tokens, labels = tokenize_sentence(sentence)
+                result.append({
+                    'id': row_id,
+                    # Deterministic so re-running or resuming produces the same ids
+                    'chunk_id': str(uuid.uuid5(uuid.NAMESPACE_URL, f"{row_id}/{sentence_index}")),
+                    'question': sentence,
+                    'tokens': tokens,
+                    'labels': labels
+                })
+    return result
+
+def write_shard(task):
+    shard_index, rows, output_dir = task
+    records = process_rows(rows)
+    shard_path = os.path.join(output_dir, SHARD_PATTERN.format(shard_index))
+    temp_path = shard_path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False))
+            f.write('\n')
+    # The rename is atomic, so a shard file only exists once it is complete
+    os.replace(temp_path, shard_path)
+    return shard_index, len(rows), len(records)
+
+def iter_shard_tasks(csv_file_path, output_dir, chunk_size, resume, in_flight=None):
+    """
+    One task per CSV chunk still to write. in_flight, a semaphore, is acquired
+    before each chunk is read, so only as many chunks as it allows are in memory.
+    """
+    reader = pd.read_csv(csv_file_path, usecols=['id', 'body'], chunksize=chunk_size)
+    for shard_index, chunk in enumerate(reader):
+        if resume and os.path.exists(os.path.join(output_dir, SHARD_PATTERN.format(shard_index))):
+            logger.info(f"Skipping completed shard {shard_index}")
+            continue
+        if in_flight is not None:
+            in_flight.acquire()
+        yield shard_index, list(chunk.itertuples(index=False, name=None)), output_dir
+
+def prepare_output_dir(output_dir, chunk_size, resume):
+    """
+    Check that existing shards were cut with the same chunk size before resuming,
+    and record it in the manifest. Without resume, existing shards are removed.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    if resume and list_shards(output_dir):
+        manifest = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding='utf-8') as f:
+                manifest = json.load(f)
+        if manifest.get('chunk_size') != chunk_size:
+            raise ValueError(f"Shards in {output_dir} were written with chunk size {manifest.get('chunk_size')}, "
+                             f"not {chunk_size}; rerun with that chunk size or with --no-resume")
+    elif not resume:
+        for shard_path in list_shards(output_dir):
+            os.remove(shard_path)
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump({'chunk_size': chunk_size}, f)
+
+def prepare_shards(csv_file_path, output_dir, chunk_size=5000, workers=None, resume=True):
+    """
+    Stream the question CSV in chunks and write one JSONL shard per chunk using a process pool.
+
+    At most two chunks per worker are read ahead of the pool. With resume
+    enabled, chunks whose shard already exists are skipped, so an interrupted
+    run picks up where it stopped; the chunk size must match the one in the
+    output directory's manifest. Returns the number of sentences written.
+    """
+    prepare_output_dir(output_dir, chunk_size, resume)
+    start = time.perf_counter()
+    total_rows = total_sentences = 0
+
+    with Pool(processes=workers) as pool:
+        # The pool's task feeder reads the generator as fast as it can; this holds it back
+        in_flight = threading.BoundedSemaphore(2 * (workers or os.cpu_count() or 1))
+        tasks = iter_shard_tasks(csv_file_path, output_dir, chunk_size, resume, in_flight)
+        for shard_index, row_count, sentence_count in pool.imap_unordered(write_shard, tasks):
+            in_flight.release()
+            total_rows += row_count
+            total_sentences += sentence_count
+            elapsed = time.perf_counter() - start
+            logger.info(f"Shard {shard_index}: {sentence_count} sentences from {row_count} posts "
+                        f"({total_sentences / elapsed:.0f} sentences/s overall)")
+
+    elapsed = time.perf_counter() - start
+    logger.info(f"Wrote {total_sentences} sentences from {total_rows} posts to {output_dir} "
+                f"in {elapsed:.1f}s ({total_sentences / max(elapsed, 1e-9):.0f} sentences/s)")
+    return total_sentences
+
+def list_shards(output_dir):
+    return sorted(glob.glob(os.path.join(output_dir, "shard-*.jsonl")))
+
 def parse_csv_to_json(csv_file_path, output_json_path):
     try:
-        df = pd.read_csv(csv_file_path)
-        result = []
-        
-        for _, row in df.iterrows():
-            body = normalize_apostrophes(row['body'])
-            sentences = re.split(r'(?<=[.!?])\s+', body)
-            
-            for sentence in sentences:
-                if '[[' in sentence and ']]' in sentence:
-                    tokens = []
-                    labels = []
-                    parts = re.split(r'(\[\[[^\]]+\]\])', sentence)
-                    
-                    for part in parts:
-                        if part.startswith('[[') and part.endswith(']]'):
-                            card_name = part[2:-2]
-                            card_tokens = re.findall(r"[\w']+'s|\w+|[.,!?;]", card_name)
-                            
-                            for i, token in enumerate(card_tokens):
-                                tokens.append(token)
-                                labels.append('B-CARD' if i == 0 else 'I-CARD')
-                        else:
-                            other_tokens = re.findall(r"\w+|[.,!?;]", part)
-                            tokens.extend(other_tokens)
-                            labels.extend(['O'] * len(other_tokens))
-                    
-                    result.append({
-                        'id': row['id'],
-                        'chunk_id': str(uuid.uuid4()),
-                        'question': sentence,
-                        'tokens': tokens,
-                        'labels': labels
-                    })
-        
+        df = pd.read_csv(csv_file_path, usecols=['id', 'body'])
+        result = process_rows(df.itertuples(index=False, name=None))
+
         with open(output_json_path, 'w', encoding='utf-8') as f:
             json.dump(result, f, ensure_ascii=False, indent=2)
-        
+
         print(f"JSON data saved to {output_json_path}")
     except Exception as e:
         print(f"An error occurred: {str(e)}")
 
-# Usage
-csv_file_path = 'data/mtg_rules_questions.csv'
-output_json_path = 'data/prepared_mtg_rules_questions.json'
-parse_csv_to_json(csv_file_path, output_json_path)
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prepare tagged training data from the MTG rules question corpus.")
+    parser.add_argument("--csv", default="data/mtg_rules_questions.csv", help="Question CSV (default: data/mtg_rules_questions.csv)")
+    parser.add_argument("--output", default="data/prepared_mtg_rules_questions",
+                        help="Shard directory, or a .json file for the single-file format (default: data/prepared_mtg_rules_questions)")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Posts per shard (default: 5000)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--no-resume", action="store_true", help="Rebuild shards that already exist")
+    args = parser.parse_args()
+
+    if args.output.endswith(".json"):
+        parse_csv_to_json(args.csv, args.output)
+    else:
+        prepare_shards(args.csv, args.output, args.chunk_size, args.workers, resume=not args.no_resume)
@@ -1,7 +1,17 @@
+import argparse
+import copy
+import glob
 import json
+import os
+import re
+import statistics
+import time
 import torch
+import torch.nn.functional as F
+from torch.utils.data import DataLoader
 import numpy as np
-from datasets import Dataset
+import pandas as pd
+from datasets import Dataset, concatenate_datasets, load_dataset
 from transformers import AutoTokenizer, AutoModelForTokenClassification, TrainingArguments, Trainer, DataCollatorForTokenClassification
 import logging
 import gc
@@ -12,14 +22,31 @@ from seqeval.scheme import IOB2
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 
-def load_data(file_path, max_samples=1000):
+# Fixed so the test split can be reproduced when evaluating exported models
+SPLIT_SEED = 42
+
+def load_data(file_path, max_samples=None):
+    """
+    Load tagged samples from a JSON file, or from a directory of JSONL shards written by tokenize_queries.
+
+    Shards are loaded as a memory-mapped Arrow dataset rather than a list, so the
+    corpus doesn't have to fit in memory. max_samples caps the sample count when set.
+    """
     try:
-        with open(file_path, 'r') as f:
-            data = json.load(f)
-        
         # Define NER labels
         ner_labels = ["O", "B-CARD", "I-CARD"]
         label_map = {label: i for i, label in enumerate(ner_labels)}
+
+        if os.path.isdir(file_path) or file_path.endswith(".jsonl"):
+            data_files = sorted(glob.glob(os.path.join(file_path, "*.jsonl"))) if os.path.isdir(file_path) else [file_path]
+            data = load_dataset("json", data_files=data_files, split="train").select_columns(["tokens", "labels"])
+            if max_samples:
+                data = data.select(range(min(max_samples, len(data))))
+            logging.info(f"Loaded {len(data)} samples from {len(data_files)} shards in {file_path}")
+            return data, label_map
+
+        with open(file_path, 'r') as f:
+            data = json.load(f)
         
         logging.info(f"Loaded and converted {len(data)} samples to NER format from {file_path}")
         return data[:max_samples], label_map
@@ -28,6 +55,8 @@ def load_data(file_path, max_samples=1000):
         return None, None
 
 def create_dataset(data):
+    if isinstance(data, Dataset):
+        return data
     try:
         hf_dataset = Dataset.from_dict({
             'tokens': [item['tokens'] for item in data],
@@ -102,13 +131,337 @@ def compute_metrics(p, id_to_label):
 
     return results
 
-def main():
+def build_gazetteer(database_path, min_length=4):
+    """Set of lowercased card name token tuples, skipping very short single-word names."""
+    from my_agent.api.mtg_cards_api import fetch_all_card_names
+
+    gazetteer = set()
+    for card_name in fetch_all_card_names(database_path):
+        # Double-faced cards are stored as "Front // Back"; either face can be referenced
+        for face in card_name.split(" // "):
+            tokens = tuple(token.lower() for token in re.findall(r"\w+|[.,!?;]", face))
+            if len(tokens) > 1 or (tokens and len(tokens[0]) >= min_length):
+                gazetteer.add(tokens)
+    logging.info(f"Built gazetteer with {len(gazetteer)} card names")
+    return gazetteer
+
+def weak_label_tokens(tokens, gazetteer, max_name_tokens):
+    """Greedy longest-match of gazetteer names over capitalized token runs."""
+    labels = ["O"] * len(tokens)
+    i = 0
+    while i < len(tokens):
+        match_length = 0
+        if tokens[i][:1].isupper():
+            for length in range(min(max_name_tokens, len(tokens) - i), 0, -1):
+                if tuple(token.lower() for token in tokens[i:i + length]) in gazetteer:
+                    match_length = length
+                    break
+        if match_length:
+            labels[i] = "B-CARD"
+            labels[i + 1:i + match_length] = ["I-CARD"] * (match_length - 1)
+            i += match_length
+        else:
+            i += 1
+    return labels
+
+def weak_label_questions(csv_file_path, gazetteer, max_samples=None):
+    """Label sentences from the question corpus with the gazetteer, keeping those that mention a card."""
+    max_name_tokens = max(len(name) for name in gazetteer)
+    df = pd.read_csv(csv_file_path, usecols=["body"])
+    weak_data = []
+    for body in df["body"].dropna():
+        for sentence in re.split(r'(?<=[.!?])\s+', body.replace('\u2019', "'")):
+            # Drop the bracket markup so weak labels come from the gazetteer alone
+            tokens = re.findall(r"\w+|[.,!?;]", sentence.replace("[[", "").replace("]]", ""))
+            labels = weak_label_tokens(tokens, gazetteer, max_name_tokens)
+            if "B-CARD" in labels:
+                weak_data.append({"tokens": tokens, "labels": labels})
+                if max_samples and len(weak_data) >= max_samples:
+                    break
+        if max_samples and len(weak_data) >= max_samples:
+            break
+    logging.info(f"Weak-labeled {len(weak_data)} sentences from {csv_file_path}")
+    return weak_data
+
+def build_student_model(teacher_config, num_layers, hidden_size):
+    """A narrow, shallow copy of the teacher architecture that keeps its vocabulary and labels."""
+    config = copy.deepcopy(teacher_config)
+    config.num_hidden_layers = num_layers
+    config.hidden_size = hidden_size
+    config.num_attention_heads = max(1, hidden_size // 64)
+    config.intermediate_size = hidden_size * 4
+    return AutoModelForTokenClassification.from_config(config)
+
+class TokenBudgetBatchSampler:
+    """
+    Batches of similar-length samples whose padded size (longest sample * batch size) stays under a token budget.
+
+    Samples are sorted by length once, with ties broken randomly, and packed
+    greedily; only the order of the batches is shuffled each epoch, so the
+    number of batches is fixed and the Trainer's step accounting stays exact.
+    """
+
+    def __init__(self, lengths, max_tokens, shuffle=True, seed=SPLIT_SEED):
+        self.lengths = lengths
+        self.max_tokens = max_tokens
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+        self.batches = self._pack(np.random.default_rng(seed).permutation(len(lengths)))
+
+    def _pack(self, indices):
+        ordered = sorted(indices, key=lambda i: self.lengths[i], reverse=True)
+        batches = []
+        batch = []
+        longest = 0
+        for index in ordered:
+            length = self.lengths[index]
+            if batch and max(longest, length) * (len(batch) + 1) > self.max_tokens:
+                batches.append(batch)
+                batch = []
+                longest = 0
+            batch.append(int(index))
+            longest = max(longest, length)
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def __iter__(self):
+        order = list(range(len(self.batches)))
+        if self.shuffle:
+            np.random.default_rng(self.seed + self.epoch).shuffle(order)
+        self.epoch += 1
+        for i in order:
+            yield self.batches[i]
+
+    def __len__(self):
+        return len(self.batches)
+
+class BucketedTrainer(Trainer):
+    """Trainer with optional token-budget batching that also counts the samples it trains on."""
+
+    def __init__(self, *args, token_budget=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.token_budget = token_budget
+        self.samples_seen = 0
+
+    def get_train_dataloader(self):
+        if not self.token_budget:
+            return super().get_train_dataloader()
+
+        lengths = []
+        for batch in self.train_dataset.iter(batch_size=1000):
+            lengths.extend(len(input_ids) for input_ids in batch["input_ids"])
+        batch_sampler = TokenBudgetBatchSampler(lengths, self.token_budget, seed=self.args.seed)
+        logging.info(f"Token budget {self.token_budget}: {len(batch_sampler)} batches, "
+                     f"{len(lengths) / len(batch_sampler):.1f} samples per batch on average")
+
+        return self.accelerator.prepare(DataLoader(
+            self.train_dataset,
+            batch_sampler=batch_sampler,
+            collate_fn=self.data_collator,
+            num_workers=self.args.dataloader_num_workers,
+            pin_memory=self.args.dataloader_pin_memory,
+        ))
+
+    def training_step(self, model, inputs, *args, **kwargs):
+        self.samples_seen += inputs["input_ids"].shape[0]
+        return super().training_step(model, inputs, *args, **kwargs)
+
+def resolve_mixed_precision(mode):
+    """Pick fp16/bf16 for "auto" only where the hardware supports it; CPU training stays in fp32."""
+    if mode != "auto":
+        return None if mode == "no" else mode
+    if torch.cuda.is_available():
+        return "bf16" if torch.cuda.is_bf16_supported() else "fp16"
+    return None
+
+def build_training_arguments(args, output_dir, learning_rate, batch_size, epochs, **overrides):
+    precision = resolve_mixed_precision(args.mixed_precision)
+    logging.info(f"Batch size {batch_size}, gradient accumulation {args.gradient_accumulation_steps}, "
+                 f"group by length: {args.group_by_length}, token budget: {args.token_budget}, "
+                 f"mixed precision: {precision or 'no'}")
+    training_kwargs = dict(
+        output_dir=output_dir,
+        evaluation_strategy="epoch",
+        learning_rate=learning_rate,
+        per_device_train_batch_size=batch_size,
+        per_device_eval_batch_size=batch_size,
+        gradient_accumulation_steps=args.gradient_accumulation_steps,
+        group_by_length=args.group_by_length,
+        fp16=precision == "fp16",
+        bf16=precision == "bf16",
+        num_train_epochs=epochs,
+        max_steps=args.max_steps,
+        weight_decay=0.01,
+        logging_dir='./logs',
+        logging_steps=10,
+        save_strategy="epoch",
+        load_best_model_at_end=True,
+        metric_for_best_model="f1",
+        push_to_hub=False,
+        greater_is_better=True,
+        remove_unused_columns=False,
+    )
+    training_kwargs.update(overrides)
+    return TrainingArguments(**training_kwargs)
+
+def compare_throughput(args, tokenized_datasets, tokenizer, model_name, num_labels):
+    """Train a few steps with the default fixed batches and with the configured mode, reporting samples/s."""
+    steps = args.max_steps if args.max_steps > 0 else 50
+    baseline_args = argparse.Namespace(**{
+        **vars(args), "group_by_length": False, "token_budget": None,
+        "gradient_accumulation_steps": 1, "mixed_precision": "no",
+    })
+    modes = {
+        "fixed batches": (baseline_args, 8),
+        "configured": (args, args.batch_size),
+    }
+
+    results = {}
+    for name, (mode_args, batch_size) in modes.items():
+        model = AutoModelForTokenClassification.from_pretrained(model_name, num_labels=num_labels, ignore_mismatched_sizes=True)
+        trainer = BucketedTrainer(
+            model=model,
+            args=build_training_arguments(
+                mode_args, "./results_throughput", 2e-5, batch_size, 1,
+                max_steps=steps, evaluation_strategy="no", save_strategy="no",
+                load_best_model_at_end=False, report_to=[]
+            ),
+            train_dataset=tokenized_datasets["train"],
+            tokenizer=tokenizer,
+            data_collator=DataCollatorForTokenClassification(tokenizer),
+            token_budget=mode_args.token_budget,
+        )
+        runtime = trainer.train().metrics["train_runtime"]
+        results[name] = trainer.samples_seen / runtime
+
+    logging.info(f"{'mode':<14} {'samples/s':>10}")
+    for name, samples_per_second in results.items():
+        logging.info(f"{name:<14} {samples_per_second:>10.2f}")
+    return results
+
+class DistillationTrainer(BucketedTrainer):
+    """Trains the student on a mix of hard-label cross entropy and the teacher's softened logits."""
+
+    def __init__(self, *args, teacher_model=None, temperature=2.0, alpha=0.5, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.teacher_model = teacher_model.to(self.args.device).eval()
+        self.temperature = temperature
+        self.alpha = alpha
+
+    def compute_loss(self, model, inputs, return_outputs=False, **kwargs):
+        outputs = model(**inputs)
+        if not model.training:
+            # Evaluation and predict measure the student alone, without a teacher forward pass
+            return (outputs.loss, outputs) if return_outputs else outputs.loss
+        with torch.no_grad():
+            teacher_logits = self.teacher_model(**{k: v for k, v in inputs.items() if k != "labels"}).logits
+
+        mask = inputs["attention_mask"].bool()
+        student_log_probs = F.log_softmax(outputs.logits[mask] / self.temperature, dim=-1)
+        teacher_probs = F.softmax(teacher_logits[mask] / self.temperature, dim=-1)
+        distillation_loss = F.kl_div(student_log_probs, teacher_probs, reduction="batchmean") * self.temperature ** 2
+
+        loss = self.alpha * outputs.loss + (1 - self.alpha) * distillation_loss
+        return (loss, outputs) if return_outputs else loss
+
+def directory_size_mb(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names) / 1e6
+
+def measure_cpu_latency_ms(model, tokenizer, questions):
+    # A copy, so the model (and a trainer's teacher) stays on its device
+    model = copy.deepcopy(model).to("cpu").eval()
+    latencies = []
+    with torch.inference_mode():
+        for question in questions:
+            encoded = tokenizer(question, return_tensors="pt")
+            start = time.perf_counter()
+            model(**encoded)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.median(latencies)
+
+def compare_models(models, trainer, tokenized_test, tokenizer, questions, id_to_label):
+    """F1 via compute_metrics, parameter count, on-disk size and median CPU latency for each model."""
+    report = {}
+    for name, (model, path) in models.items():
+        trainer.model = model.to(trainer.args.device)
+        prediction = trainer.predict(tokenized_test)
+        metrics = compute_metrics((prediction.predictions, prediction.label_ids), id_to_label)
+        report[name] = {
+            "f1": metrics["f1"],
+            "parameters_m": sum(p.numel() for p in model.parameters()) / 1e6,
+            "size_mb": directory_size_mb(path),
+            "cpu_latency_ms": measure_cpu_latency_ms(model, tokenizer, questions),
+        }
+
+    logging.info(f"{'model':<8} {'F1':>6} {'params (M)':>11} {'size (MB)':>10} {'CPU p50 (ms)':>13}")
+    for name, row in report.items():
+        logging.info(f"{name:<8} {row['f1']:>6.3f} {row['parameters_m']:>11.1f} {row['size_mb']:>10.1f} {row['cpu_latency_ms']:>13.2f}")
+    return report
+
+def distill(args):
+    logging.info("Starting distillation...")
+    data, label_to_id = load_data(args.data, args.max_samples)
+    if data is None:
+        return
+    id_to_label = {i: label for label, i in label_to_id.items()}
+
+    train_test = create_dataset(data).train_test_split(test_size=0.2, seed=SPLIT_SEED)
+    if args.weak_label_questions:
+        gazetteer = build_gazetteer(args.card_db)
+        weak_data = weak_label_questions(args.weak_label_questions, gazetteer, args.max_weak_samples)
+        if weak_data:
+            train_test["train"] = concatenate_datasets([train_test["train"], create_dataset(weak_data)])
+    logging.info(f"Train set size: {len(train_test['train'])}")
+    logging.info(f"Test set size: {len(train_test['test'])}")
+
+    tokenizer = AutoTokenizer.from_pretrained(args.teacher_path)
+    teacher = AutoModelForTokenClassification.from_pretrained(args.teacher_path)
+    student = build_student_model(teacher.config, args.student_layers, args.student_hidden_size)
+    logging.info(f"Student: {args.student_layers} layers, hidden size {args.student_hidden_size}")
+
+    tokenized_datasets = train_test.map(
+        lambda examples: tokenize_and_align_labels(examples, tokenizer, label_to_id),
+        batched=True,
+        remove_columns=train_test["train"].column_names
+    )
+
+    training_args = build_training_arguments(args, "./results_distill", 5e-5, args.batch_size, args.epochs)
+
+    trainer = DistillationTrainer(
+        model=student,
+        args=training_args,
+        train_dataset=tokenized_datasets["train"],
+        eval_dataset=tokenized_datasets["test"],
+        tokenizer=tokenizer,
+        data_collator=DataCollatorForTokenClassification(tokenizer),
+        compute_metrics=lambda p: compute_metrics(p, id_to_label),
+        token_budget=args.token_budget,
+        teacher_model=teacher,
+        temperature=args.temperature,
+        alpha=args.alpha,
+    )
+    trainer.train()
+    trainer.save_model(args.student_output)
+    logging.info(f"Student model saved to {args.student_output}")
+
+    questions = [" ".join(tokens) for tokens in train_test["test"]["tokens"]]
+    report = compare_models(
+        {"teacher": (teacher, args.teacher_path), "student": (trainer.model, args.student_output)},
+        trainer, tokenized_datasets["test"], tokenizer, questions, id_to_label
+    )
+    with open(os.path.join(args.student_output, "distillation_report.json"), "w") as f:
+        json.dump(report, f, indent=2)
+
+def main(args=None):
+    args = args or parse_args([])
     logging.info("Starting script...")
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
     logging.info(f"Using device: {device}")
 
     try:
-        data, label_to_id = load_data('sanity_check_tagged_data.json')
+        data, label_to_id = load_data(args.data, args.max_samples)
         if data is None:
             return
 
@@ -117,7 +470,7 @@ def main():
             return
         logging.info(f"Dataset size: {len(hf_dataset)}")
 
-        train_test = hf_dataset.train_test_split(test_size=0.2)
+        train_test = hf_dataset.train_test_split(test_size=0.2, seed=SPLIT_SEED)
         logging.info(f"Train set size: {len(train_test['train'])}")
         logging.info(f"Test set size: {len(train_test['test'])}")
 
@@ -141,33 +494,26 @@ def main():
         logging.info(f"Tokenized test set size: {len(tokenized_datasets['test'])}")
         logging.info(f"Train dataset features: {tokenized_datasets['train'].features}")
 
-        training_args = TrainingArguments(
-            output_dir="./results",
-            evaluation_strategy="epoch",
-            learning_rate=2e-5,
-            per_device_train_batch_size=8,
-            per_device_eval_batch_size=8,
-            num_train_epochs=3,
-            weight_decay=0.01,
-            logging_dir='./logs',
-            logging_steps=10,
-            save_strategy="epoch",
-            load_best_model_at_end=True,
-            metric_for_best_model="f1",
-            push_to_hub=False,
-            greater_is_better=True,
-            remove_unused_columns=False,
-        )
+        if args.compare_throughput:
+            compare_throughput(args, tokenized_datasets, tokenizer, model_name, num_labels)
+            return
+
+        training_args = build_training_arguments(args, "./results", 2e-5, args.batch_size, 3)
 
-        data_collator = DataCollatorForTokenClassification(tokenizer)
-        trainer = Trainer(
+        # Pads each batch to its own longest sample; multiples of 8 suit fp16/bf16 kernels
+        data_collator = DataCollatorForTokenClassification(
+            tokenizer,
+            pad_to_multiple_of=8 if training_args.fp16 or training_args.bf16 else None
+        )
+        trainer = BucketedTrainer(
             model=model,
             args=training_args,
             train_dataset=tokenized_datasets["train"],
             eval_dataset=tokenized_datasets["test"],
             tokenizer=tokenizer,
             data_collator=data_collator,
-            compute_metrics=lambda p: compute_metrics(p, id_to_label)
+            compute_metrics=lambda p: compute_metrics(p, id_to_label),
+            token_budget=args.token_budget
         )
         logging.info("Initialized Trainer")
 
@@ -186,5 +532,36 @@ def main():
         gc.collect()
         torch.cuda.empty_cache()
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Train the card name recognition model.")
+    parser.add_argument("--data", default="sanity_check_tagged_data.json",
+                        help="Tagged training data: a JSON file or a tokenize_queries shard directory (default: sanity_check_tagged_data.json)")
+    parser.add_argument("--max-samples", type=int, default=None, help="Cap on training samples (default: no cap)")
+    parser.add_argument("--distill", action="store_true", help="Distill a small student from the trained model instead of fine-tuning bert-base")
+    parser.add_argument("--teacher-path", default="models/mtg_card_name_model", help="Trained teacher model (default: models/mtg_card_name_model)")
+    parser.add_argument("--student-output", default="models/mtg_card_name_student", help="Where to save the student (default: models/mtg_card_name_student)")
+    parser.add_argument("--student-layers", type=int, default=4, help="Student transformer layers (default: 4)")
+    parser.add_argument("--student-hidden-size", type=int, default=256, help="Student hidden size (default: 256)")
+    parser.add_argument("--temperature", type=float, default=2.0, help="Softmax temperature for the teacher's soft labels (default: 2.0)")
+    parser.add_argument("--alpha", type=float, default=0.5, help="Weight of the hard-label loss versus the soft-label loss (default: 0.5)")
+    parser.add_argument("--epochs", type=int, default=10, help="Student training epochs (default: 10)")
+    parser.add_argument("--batch-size", type=int, default=8, help="Per-device batch size when not using a token budget (default: 8)")
+    parser.add_argument("--group-by-length", action="store_true", help="Sample batches of similar sequence length to cut padding")
+    parser.add_argument("--token-budget", type=int, default=None, help="Build batches up to this many padded tokens instead of a fixed batch size")
+    parser.add_argument("--gradient-accumulation-steps", type=int, default=1, help="Batches accumulated per optimizer step (default: 1)")
+    parser.add_argument("--mixed-precision", choices=["auto", "no", "fp16", "bf16"], default="auto",
+                        help="auto uses bf16/fp16 on supporting GPUs and fp32 on CPU (default: auto)")
+    parser.add_argument("--max-steps", type=int, default=-1, help="Stop after this many optimizer steps (default: train full epochs)")
+    parser.add_argument("--compare-throughput", action="store_true",
+                        help="Report training samples/s for fixed batches versus the configured mode instead of training")
+    parser.add_argument("--weak-label-questions", default=None, help="Question CSV to weak-label with the card name gazetteer, e.g. data/mtg_rules_questions.csv")
+    parser.add_argument("--card-db", default="db/mtg_cards.sqlite", help="Card database used to build the gazetteer (default: db/mtg_cards.sqlite)")
+    parser.add_argument("--max-weak-samples", type=int, default=None, help="Cap on weak-labeled sentences (default: no cap)")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    if args.distill:
+        distill(args)
+    else:
+        main(args)
\ No newline at end of file